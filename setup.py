@@ -31,15 +31,17 @@ setup(
 	package_data={'src': EXTRA_FILES},
 	package_dir={'': 'src'},
     install_requires=[
-        'matplotlib>=3.2.1',
         'numpy>=1.18.2',
-        'pillow>=7.1.2',
+        'pillow>=9.2.0',
         'py-ubjson>=0.15.0',
         'PyYaml>=5.3.1',
-        'termcolor>=1.1.0',
-        'tk>=0.1.0'
+        'termcolor>=1.1.0'
     ],
-    python_requires='~=3.6',
+    extras_require={
+        'uvloop': ['uvloop>=0.14.0'],
+        'train': ['hmmlearn>=0.2.3']
+    },
+    python_requires='>=3.8',
     url='',
     entry_points={
         'console_scripts':
@@ -3,15 +3,15 @@ import datetime
 import logging
 import os
 
-from meleeai.framework.engine import Engine
-
 FORMAT = '(%(asctime)s) [%(filename)s:%(lineno)s - %(funcName)20s() ] [%(levelname)s] %(message)s'
 
 def main():
     parser = argparse.ArgumentParser(description='Alfred The Melee AI')
     parser.add_argument('-d', '--display', required=False, action='store_true', help='Display Alfred, helpful when sending/receiving on a separate node.')
     parser.add_argument('-r', '--run', required=False, action='store_true', help='Run Alfred, uses the configuration file generated for the model location.')
-    parser.add_argument('-t', '--train', required=False, action='store_true', help='Trains Alfred provided a particular dataset of sequential images paired against Slippi data loaded by the config.')
+    parser.add_argument('-t', '--train', required=False, action='store_true', help='Trains Alfred on the replays set in the config, converting them into a sharded dataset the first time.')
+    parser.add_argument('-o', '--record', default=None, action='store', type=str, help='Record the stream without a window, to an mp4 file (requires ffmpeg) or else a directory of PNGs.')
+    parser.add_argument('--downsample', default=1, action='store', type=int, help='Factor the recorded frames are downsampled by.')
     parser.add_argument('-c', '--config', default=None, action='store', type=str, help='Configuration file location, if none is provided then use Alfred default.')
     args = parser.parse_args()
 
@@ -28,7 +28,9 @@ def main():
         ]
     )
     
-    with Engine(display=args.display, predict=args.run, train=args.train) as engine:
+    # Only imported once the arguments are parsed, as the engine's dependencies dominate startup
+    from meleeai.framework.engine import Engine
+    with Engine(display=args.display, predict=args.run, train=args.train, record=args.record, downsample=args.downsample) as engine:
         engine.main()
 
 if __name__ == '__main__':
@@ -1 +1,6 @@
-from meleeai.framework.engine import Engine
\ No newline at end of file
+def __getattr__(name):
+    # Engine pulls in the whole runtime, only import it once it is asked for so submodules stay cheap to import
+    if name == 'Engine':
+        from meleeai.framework.engine import Engine
+        return Engine
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,248 @@
+"""
+    Training dataset of per-frame feature vectors, converted once from Slippi replays so training never re-parses them.
+    Every row is one port's leader on one frame: its controller input from the pre-frame update and its resulting
+    state from the post-frame update. Rows are written in fixed-size .npy shards, which np.load memory-maps, along with
+    an index.json listing the shards and the contiguous sequence of rows each port of each game occupies.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+
+import numpy as np
+
+from slippi import corpus
+
+# Fixed-size record of a row. Discrete features are integers: character, action state, logical button bitmask
+# (slippi.event.Buttons.Logical), stocks, facing direction, airborne and jumps remaining. Continuous features are floats.
+RECORD = np.dtype([
+    ('game', '<u4'),
+    ('frame', '<i4'),
+    ('port', 'u1'),
+    ('character', 'u1'),
+    ('state', '<u2'),
+    ('buttons', '<u4'),
+    ('stocks', 'u1'),
+    ('direction', 'i1'),
+    ('airborne', 'u1'),
+    ('jumps', 'u1'),
+    ('joystick', '<f4', (2,)),
+    ('cstick', '<f4', (2,)),
+    ('triggers', '<f4'),
+    ('position', '<f4', (2,)),
+    ('damage', '<f4'),
+    ('shield', '<f4'),
+    ('state_age', '<f4')
+], align=True)
+
+# Continuous controller features, in the order controls() returns them.
+CONTROLS = ('joystick', 'cstick', 'triggers')
+
+INDEX = 'index.json'
+
+def _column(columns, name, count, dtype):
+    # Fields added by later Slippi versions are None in older replays
+    value = getattr(columns, name)
+    if value is None:
+        return np.zeros(count, dtype=dtype)
+    return np.nan_to_num(value)
+
+def features(game, game_index=0):
+    """
+    Converts a game parsed with columnar frames into rows, each port's frames contiguous and in frame order.
+    :param game: slippi.Game, parsed with columnar=True.
+    :param game_index: Value of every row's game field, the game's position in the index.
+    :return: List of (port, rows) by port played, rows being an array of RECORD.
+    """
+    frames = game.frames
+    sequences = []
+    for port, data in enumerate(frames.ports):
+        if data is None:
+            continue
+        leader = data.leader
+        present = leader.present
+        count = int(present.sum())
+        pre, post = leader.pre, leader.post
+
+        rows = np.zeros(count, dtype=RECORD)
+        rows['game'] = game_index
+        rows['frame'] = frames.index[present]
+        rows['port'] = port
+        rows['character'] = _column(post, 'character', len(present), 'u1')[present]
+        rows['state'] = _column(post, 'state', len(present), '<u2')[present]
+        rows['buttons'] = _column(pre, 'buttons_logical', len(present), '<u4')[present]
+        rows['stocks'] = _column(post, 'stocks', len(present), 'u1')[present]
+        rows['direction'] = _column(post, 'direction', len(present), 'i1')[present]
+        rows['airborne'] = _column(post, 'airborne', len(present), 'u1')[present]
+        rows['jumps'] = _column(post, 'jumps', len(present), 'u1')[present]
+        rows['joystick'] = np.stack((_column(pre, 'joystick_x', len(present), '<f4')[present], _column(pre, 'joystick_y', len(present), '<f4')[present]), axis=1)
+        rows['cstick'] = np.stack((_column(pre, 'cstick_x', len(present), '<f4')[present], _column(pre, 'cstick_y', len(present), '<f4')[present]), axis=1)
+        rows['triggers'] = _column(pre, 'triggers_logical', len(present), '<f4')[present]
+        rows['position'] = np.stack((_column(post, 'position_x', len(present), '<f4')[present], _column(post, 'position_y', len(present), '<f4')[present]), axis=1)
+        rows['damage'] = _column(post, 'damage', len(present), '<f4')[present]
+        rows['shield'] = _column(post, 'shield', len(present), '<f4')[present]
+        rows['state_age'] = _column(post, 'state_age', len(present), '<f4')[present]
+        sequences.append((port, rows))
+    return sequences
+
+def controls(rows):
+    """
+    Gets the continuous controller features of rows as a float matrix: joystick x and y, cstick x and y, and trigger.
+    """
+    return np.column_stack([rows[name].reshape(len(rows), -1) for name in CONTROLS])
+
+def pre_controls(pre):
+    """
+    Gets the same controller features as controls() from a single decoded pre-frame update.
+    :param pre: slippi.event.Frame.Port.Data.Pre, as held by an AlignedFrame.
+    """
+    return np.array([pre.joystick.x, pre.joystick.y, pre.cstick.x, pre.cstick.y, pre.triggers.logical], dtype=np.float32)
+
+class DatasetBuilder:
+
+    def __init__(self, output, SHARD_SIZE=2**20, workers=None, cache=None):
+        """
+        Converts replays to shards, parsing them in parallel through slippi.corpus.
+        :param output: Directory the shards and index are written to.
+        :param SHARD_SIZE: Rows per shard, only the last shard holds fewer.
+        :param workers: Processes parsing replays, one per CPU by default.
+        :param cache: slippi.cache.Cache replays are parsed through, so rebuilding skips unchanged replays.
+        """
+        self.output = output
+        self.workers = workers
+        self.cache = cache
+        self.SHARD_SIZE         = SHARD_SIZE
+
+        self.games              = 0
+        self.failed_games       = 0
+        self.rows               = 0
+
+        self._shards = []
+        self._sequences = []
+        self._shard = None
+        self._filled = 0
+
+    def _flush(self, rows):
+        if self._shard is None:
+            path = os.path.join(self.output, f'shard_{len(self._shards):05d}.npy')
+            self._shard = np.lib.format.open_memmap(path, mode='w+', dtype=RECORD, shape=(self.SHARD_SIZE,))
+            self._shards.append({'file': os.path.basename(path), 'rows': 0})
+        count = min(len(rows), self.SHARD_SIZE - self._filled)
+        self._shard[self._filled:self._filled + count] = rows[:count]
+        self._filled += count
+        self._shards[-1]['rows'] = self._filled
+        if self._filled == self.SHARD_SIZE:
+            self._shard.flush()
+            self._shard = None
+            self._filled = 0
+        return count
+
+    def _write(self, rows):
+        while len(rows):
+            rows = rows[self._flush(rows):]
+
+    def _truncate_last(self):
+        # The last shard is cut to the rows written, keeping it loadable as an ordinary .npy file
+        if self._shard is None:
+            return
+        path = os.path.join(self.output, self._shards[-1]['file'])
+        rows = np.array(self._shard[:self._filled])
+        del self._shard
+        self._shard = None
+        np.save(path, rows)
+
+    def build(self, paths):
+        """
+        Converts every replay that parses, games that fail to parse are logged and skipped.
+        :param paths: Replay (.slp) paths.
+        :return: The index, as written to index.json.
+        """
+        os.makedirs(self.output, exist_ok=True)
+        games = []
+        for result in corpus.load(paths, workers=self.workers, columnar=True, cache=self.cache):
+            if result.error:
+                self.failed_games += 1
+                continue
+            for port, rows in features(result.game, len(games)):
+                self._sequences.append({'game': len(games), 'port': port, 'start': self.rows, 'rows': len(rows)})
+                self._write(rows)
+                self.rows += len(rows)
+            games.append(result.path)
+            self.games += 1
+        self._truncate_last()
+
+        index = {
+            'dtype': np.lib.format.dtype_to_descr(RECORD),
+            'shard_size': self.SHARD_SIZE,
+            'rows': self.rows,
+            'games': games,
+            'shards': self._shards,
+            'sequences': self._sequences
+        }
+        with open(os.path.join(self.output, INDEX), 'w') as stream:
+            json.dump(index, stream)
+        logging.info(f'Built {self.rows} rows from {self.games} games into {len(self._shards)} shards, {self.failed_games} failed to parse.')
+        return index
+
+class Dataset:
+
+    def __init__(self, directory):
+        """
+        Reads a dataset written by DatasetBuilder, memory-mapping its shards.
+        :param directory: Directory holding index.json and the shards.
+        """
+        self.directory = directory
+        with open(os.path.join(directory, INDEX), 'r') as stream:
+            self.index = json.load(stream)
+
+    def __len__(self):
+        return self.index['rows']
+
+    def shards(self):
+        """
+        Memory-maps each shard in turn, in row order.
+        """
+        for shard in self.index['shards']:
+            yield np.load(os.path.join(self.directory, shard['file']), mmap_mode='r')[:shard['rows']]
+
+    def sequences(self, minimum=1):
+        """
+        Streams the rows shard by shard, grouped into each port's sequence within a game. A sequence split across
+        shards is joined back together.
+        :param minimum: Fewest rows a sequence needs to be yielded.
+        :return: Generator of rows of one port in one game.
+        """
+        pending = iter(self.index['sequences'])
+        sequence = next(pending, None)
+        start = 0
+        parts = []
+        for shard in self.shards():
+            end = start + len(shard)
+            while sequence is not None and sequence['start'] < end:
+                first = max(sequence['start'], start)
+                last = min(sequence['start'] + sequence['rows'], end)
+                parts.append(shard[first - start:last - start])
+                if last < sequence['start'] + sequence['rows']:
+                    break
+                if sequence['rows'] >= minimum:
+                    yield parts[0] if len(parts) == 1 else np.concatenate(parts)
+                parts = []
+                sequence = next(pending, None)
+            start = end
+
+def main():
+    parser = argparse.ArgumentParser(description='Converts Slippi replays into a sharded training dataset.')
+    parser.add_argument('replays', type=str, help='Directory searched recursively for replays (.slp).')
+    parser.add_argument('output', type=str, help='Directory the shards and index are written to.')
+    parser.add_argument('-w', '--workers', default=None, type=int, help='Processes parsing replays, one per CPU by default.')
+    parser.add_argument('-s', '--shard-size', default=2**20, type=int, help='Rows per shard.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    paths = sorted(glob.glob(os.path.join(args.replays, '**', '*.slp'), recursive=True))
+    DatasetBuilder(args.output, SHARD_SIZE=args.shard_size, workers=args.workers).build(paths)
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,20 @@
 #!/usr/bin/env python
+import logging
+import pickle
+
+import numpy as np
+
 from hmmlearn import hmm
 
+from meleeai.framework.algorithm.dataset import controls
+
 class HiddenMarkovModel(object):
     """Class that controls the main part of the AI"""
 
     def __init__(self, pretrained_model=None):
         self.model = pretrained_model
 
-    def train(self, data, n_components=1, covariance_type='full', n_iter=100, verbose=False):
+    def train(self, dataset, n_components=16, covariance_type='full', n_iter=100, verbose=False, max_rows=2**22):
         # Train on parameters passed through including data
         """
             The data coming in should be able to be translated properly into a sequence of actions
@@ -15,7 +22,52 @@ class HiddenMarkovModel(object):
             there should also be considered combo button inputs per pre/post. Consider this.
 
             Such as, there should also be a release/neutral state on control sticks.
-            
+
+            Observations are the controller features of each row (see dataset.controls), each port of each game being
+            one sequence. Every EM iteration has to see all of them, so they are fitted in one go: when the dataset
+            holds more than max_rows rows, whole sequences are taken evenly across it until it fits.
         """
+        if n_components < 1:
+            raise ValueError(f'A model needs at least one hidden state, not {n_components}.')
+        if self.model is None:
+            self.model = hmm.GaussianHMM(n_components=n_components, covariance_type=covariance_type, n_iter=n_iter, verbose=verbose)
+        else:
+            # Continue from the parameters fitted so far rather than reinitialising them
+            self.model.init_params = ''
+
+        observations, lengths = self._observations(dataset, max_rows)
+        self.model.fit(observations, lengths)
+        logging.info(f'Fitted {len(lengths)} sequences of {len(observations)} rows, log likelihood {self.model.monitor_.history[-1] if self.model.monitor_.history else None}.')
+        return self.model
+
+    def _observations(self, dataset, max_rows):
+        rows = sum(sequence['rows'] for sequence in dataset.index['sequences'] if sequence['rows'] >= self.model.n_components)
+        if not rows:
+            raise ValueError(f'Dataset has no sequence of at least {self.model.n_components} rows to train on.')
+        step = -(-rows // max_rows)
+        if step > 1:
+            logging.info(f'Dataset holds {rows} rows, training on every {step}th sequence.')
+
+        observations, lengths = [], []
+        for index, sequence in enumerate(dataset.sequences(minimum=self.model.n_components)):
+            if index % step == 0:
+                observations.append(controls(sequence))
+                lengths.append(len(sequence))
+        return np.concatenate(observations), lengths
+
+    def predict(self, observations):
+        """
+            Predicts the controller features expected on the next frame, from those observed so far
+            (a matrix as returned by dataset.controls), by stepping the most likely current state forward.
+        """
+        state = self.model.predict(observations)[-1]
+        return self.model.transmat_[state] @ self.model.means_
+
+    def save(self, path):
+        with open(path, 'wb') as stream:
+            pickle.dump(self.model, stream)
 
-    def predict(self):
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as stream:
+            return cls(pretrained_model=pickle.load(stream))
@@ -0,0 +1,44 @@
+import collections
+
+import numpy as np
+
+from slippi.event import Buttons
+
+from meleeai.framework.algorithm.dataset import pre_controls
+from meleeai.utils.controller_parser import ControllerState
+
+class Predictor:
+
+    def __init__(self, model, port=0, HISTORY=60):
+        """
+        Drives Alfred's controller from a trained HiddenMarkovModel, as Engine's prediction engine. The controller
+        features of the port Alfred plays are kept for the last HISTORY Slippi frames, the model predicting the next
+        frame's from them.
+        :param model: Trained HiddenMarkovModel.
+        :param port: Port Alfred plays, 0 being port 1.
+        :param HISTORY: Frames of controller features the model decodes its state from.
+        """
+        self.model = model
+        self.port = port
+        self.HISTORY            = HISTORY
+
+        self._history = collections.deque(maxlen=HISTORY)
+
+    def update(self, frame):
+        """
+        Adds a Slippi frame to the history, as soon as it is received.
+        :param frame: slippi.event.Frame, as decoded by SlippiParser.
+        """
+        port = frame.ports[self.port]
+        if port is not None:
+            self._history.append(pre_controls(port.leader.pre))
+
+    def predict(self):
+        """
+        :return: ControllerState to send, or None while the port has no frame data. The model only covers the sticks
+                 and the analog trigger, so no buttons are pressed and the trigger is sent as L.
+        """
+        if not self._history:
+            return None
+        joystick_x, joystick_y, cstick_x, cstick_y, trigger = (float(value) for value in self.model.predict(np.array(self._history)))
+        return ControllerState(0, self.port, joystick_x, joystick_y, cstick_x, cstick_y, trigger, 0., Buttons.Physical.NONE)
@@ -1,76 +1,172 @@
 """
-    Matplotlib cannot exist in a separate thread, to go about this, a separate
+    Tk cannot be driven from a separate thread, to go about this, a separate
     process is queue'd off. This process is connected via Engine's multiprocessing.queue.
+    Frames are pasted straight into a Tk PhotoImage, bypassing any figure redraw.
+    Tk is only imported once the window is opened, so headless nodes can record the
+    stream through HeadlessFrame without a GUI toolkit installed.
 """
 
-import numpy as np
 import queue
-import sys
 import time
 
-import matplotlib
-matplotlib.use('TkAgg')
-
-from matplotlib import animation
-from matplotlib import ticker
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.figure import Figure
-from tkinter import * # TODO: A sin has been committed, fix later
-
-from enum import Enum
 from io import BytesIO
-from PIL import Image, ImageFont, ImageDraw
-
-class CommandType(Enum):
+from PIL import Image
 
-    UPDATE = 0,
-    SHUTDOWN = 1
+from meleeai.framework.overlay import Overlay
+from meleeai.utils.frame_writer import FrameWriter
+from meleeai.utils.message_type import CommandType
 
 class StreamFrame:
 
-    def __init__(self, video_queue_in, video_queue_out):
+    def __init__(self, video_queue_in, video_queue_out, frame_ring=None, frame_mailbox=None, MAX_FPS=60):
+        """
+        Overlay commands carry the port states drawn over every following frame, see meleeai.framework.overlay.
+        :param video_queue_in: Queue of commands for the display, an update carries an encoded image.
+        :param video_queue_out: Queue the display reports its shutdown on.
+        :param frame_ring: FrameRing holding the images, updates then carry the image's sequence number instead.
+        :param frame_mailbox: SharedMailbox the sequence number of the latest image in frame_ring is posted to,
+                              replacing updates through the queue.
+        :param MAX_FPS: Most frames displayed per second, frames arriving faster are skipped rather than queued.
+        """
         self._video_queue_in = video_queue_in
         self._video_queue_out = video_queue_out
+        self._frame_ring = frame_ring
+        self._frame_mailbox = frame_mailbox
+
+        self.FRAME_INTERVAL     = 1 / MAX_FPS
+
+        self.displayed_frames   = 0
+        self.skipped_frames     = 0
+
+        self._photo = None
+        self._overlay = None
+        self._overlay_states = None
 
 
     def _on_close(self):
         self._video_queue_out.put_nowait((CommandType.SHUTDOWN, None))
         self.window.destroy()
-    
+
 
     def initialize(self):
+        from tkinter import Label, BOTH
         self.window.protocol('WM_DELETE_WINDOW', self._on_close)
-        self.figure = Figure(figsize=(5, 4), dpi=100)
-        self.ax = self.figure.add_subplot(111)
-        self.canvas = FigureCanvasTkAgg(self.figure, master=self.window)
-        self.canvas.draw()
-        self.canvas._tkcanvas.pack(side=TOP, fill=BOTH, expand=True)
+        self.label = Label(self.window)
+        self.label.pack(fill=BOTH, expand=True)
+
+
+    def _decode(self, data):
+        if self._frame_ring is None:
+            return Image.open(BytesIO(data))
+        # Read straight out of shared memory, discarding the image if it was overwritten meanwhile
+        frame = self._frame_ring.get(data)
+        if frame is None:
+            return None
+        _, view = frame
+        with view:
+            stream = BytesIO(view)
+        if not self._frame_ring.is_valid(data):
+            return None
+        return Image.open(stream)
+
+    def _show(self, data):
+        image = self._decode(data)
+        if image is not None:
+            if self._overlay_states is not None:
+                if self._overlay is None:
+                    self._overlay = Overlay()
+                image = image.convert('RGB')
+                self._overlay.draw(image, self._overlay_states)
+            self.draw_frame(image)
+            self.displayed_frames += 1
+
+    def _poll(self):
+        """
+        Shows the latest frame received since the last poll, along with any overlay update.
+        :return: False once the display was commanded to shut down.
+        """
+        latest = None
+        if self._frame_mailbox is not None:
+            frame = self._frame_mailbox.take()
+            if frame is not None:
+                latest = frame[0]
+
+        # Only the newest update is worth displaying, any queued behind it are skipped
+        running = True
+        while running:
+            try:
+                payload = self._video_queue_in.get_nowait()
+            except queue.Empty:
+                break
+            if payload[0] == CommandType.UPDATE:
+                if latest is not None:
+                    self.skipped_frames += 1
+                latest = payload[1]
+            elif payload[0] == CommandType.OVERLAY:
+                self._overlay_states = payload[1]
+            elif payload[0] == CommandType.SHUTDOWN:
+                running = False
 
+        if latest is not None:
+            self._show(latest)
+        return running
 
     def collect_frame(self):
-        try:
-            payload = self._video_queue_in.get_nowait()
-            if payload[0] == CommandType.UPDATE:
-                self.draw_frame(np.array(Image.open(BytesIO(payload[1]))))
-                self.canvas.draw()
-            elif payload[0] == CommandType.SHUTDOWN:
-                self.window.destroy()
-        except queue.Empty:
-            pass
-        self.window.after(1, self.collect_frame)
+        started = time.monotonic()
+        if not self._poll():
+            self.window.destroy()
+            return
+        remaining = self.FRAME_INTERVAL - (time.monotonic() - started)
+        self.window.after(max(1, int(remaining * 1000)), self.collect_frame)
 
 
     def draw_frame(self, image):
-        if not hasattr(self, 'stream_image'):
-            self.stream_image = self.ax.imshow(image)
-        else:                
-            self.stream_image.set_data(image)
+        from PIL import ImageTk
+        # Paste into the existing photo, only recreating it when the stream changes size
+        if self._photo is None or (self._photo.width(), self._photo.height()) != image.size:
+            self._photo = ImageTk.PhotoImage(image)
+            self.label.configure(image=self._photo)
+        else:
+            self._photo.paste(image)
 
     def run(self):
+        from tkinter import Tk
         self.window = Tk()
         self.window.title('Stream')
         self.initialize()
         self.collect_frame()
         self.window.update()
         self.window.deiconify()
-        self.window.mainloop()
\ No newline at end of file
+        self.window.mainloop()
+
+class HeadlessFrame(StreamFrame):
+
+    def __init__(self, video_queue_in, video_queue_out, output, downsample=1, frame_ring=None, frame_mailbox=None, MAX_FPS=60, MAX_SIZE=8):
+        """
+        Display without a window, recording the stream instead, see meleeai.utils.frame_writer.
+        :param output: mp4 file or PNG sequence directory the frames are written to.
+        :param downsample: Integer factor each dimension is reduced by before encoding.
+        :param MAX_SIZE: Frames queued for encoding at once, frames beyond are dropped.
+        See StreamFrame for the remaining parameters.
+        """
+        super().__init__(video_queue_in, video_queue_out, frame_ring=frame_ring, frame_mailbox=frame_mailbox, MAX_FPS=MAX_FPS)
+        self._output = output
+        self._downsample = downsample
+        self.MAX_SIZE           = MAX_SIZE
+
+        self._writer = None
+
+    def draw_frame(self, image):
+        self._writer.write(image)
+
+    def run(self):
+        self._writer = FrameWriter(self._output, fps=round(1 / self.FRAME_INTERVAL), downsample=self._downsample, MAX_SIZE=self.MAX_SIZE)
+        try:
+            while True:
+                started = time.monotonic()
+                if not self._poll():
+                    break
+                remaining = self.FRAME_INTERVAL - (time.monotonic() - started)
+                time.sleep(max(.001, remaining))
+        finally:
+            self._writer.close()
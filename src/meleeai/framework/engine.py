@@ -1,17 +1,22 @@
-import datetime
+import glob
 import heapq
 import logging
 import os
+import signal
 import sys
 import time
 import threading
 import yaml
 
 from multiprocessing import Process, Queue, Pipe
+from multiprocessing.connection import wait
 
-from meleeai.framework.display import StreamFrame, CommandType
-from meleeai.framework.network import NetworkCommunication
-from meleeai.utils.message_type import MessageType
+from meleeai.framework.network import AsyncNetworkCommunication
+from meleeai.framework.synchronizer import Synchronizer, port_states
+from meleeai.utils import clock
+from meleeai.utils.frame_ring import FrameRing
+from meleeai.utils.mailbox import SharedMailbox
+from meleeai.utils.message_type import MessageType, CommandType
 
 #NamespcaeProxy --> multiprocessing.manager.Namespace() = direct manipulation between processes
 
@@ -23,14 +28,24 @@ class ConfigurationLoader:
             'ports' : {
                 'controller': 55071,
                 'slippi': 55080,
-                'video': 55081
+                'video': 55081,
+                'outbound': 55082
+            },
+            'training' : {
+                'replays': 'replays',
+                'dataset': 'runtime/dataset',
+                'model': 'runtime/alfred_hmm.pkl',
+                'n_components': 16
+            },
+            'prediction' : {
+                'port': 0
             }
         }
 
     # TODO: Update _verify as new required items are added
     def _verify(self):
         ret = True
-        ret &= 'ports' in self.configuration.keys() and len(list(set(['controller', 'slippi', 'video']) & set(self.configuration['ports'].keys()))) == 3
+        ret &= 'ports' in self.configuration.keys() and len(list(set(['controller', 'slippi', 'video', 'outbound']) & set(self.configuration['ports'].keys()))) == 4
         return ret
 
     def save(self, configuration=None):
@@ -41,6 +56,12 @@ class ConfigurationLoader:
         if os.path.exists(self._config_file) and os.path.isfile(self._config_file):
             with open(self._config_file, 'r') as stream:
                 self._configuration = yaml.safe_load(stream)
+            # Settings missing from an older file keep their defaults
+            for section, settings in (self._configuration or {}).items():
+                if isinstance(settings, dict) and isinstance(self.configuration.get(section), dict):
+                    self.configuration[section].update(settings)
+                else:
+                    self.configuration[section] = settings
         if self._verify():
             return self.configuration
         else:
@@ -50,15 +71,16 @@ class ConfigurationLoader:
 
 class Engine:
 
-    def __init__(self, config='alfred_config.yml', predict=False, display=False, train=False):
-        # Global fields
+    def __init__(self, config='alfred_config.yml', predict=False, display=False, train=False, record=None, downsample=1):
+        # Global fields, recording is a display without a window
         self.configuration = None
         self.predict = predict
-        self.display = display
+        self.display = display or record is not None
         self.train = train
+        self.record = record
         
         # Verify at least one functionality is active
-        if not any([predict, display, train]):
+        if not any([predict, self.display, train]):
             logging.error('No arguments provided, exiting.')
             exit(1)
 
@@ -66,19 +88,41 @@ class Engine:
         self._configuration_loader = ConfigurationLoader(config_file=config)
         self.configuration = self._configuration_loader.load()
 
-        # Objects used by the engine
+        # Objects used by the engine. Video frames are shared with the display through the ring and only their sequence
+        # numbers are sent, without a display nothing reads the images so no ring is set up
+        self._frame_ring        = FrameRing() if self.display else None
         self._network_pipe_out, self._network_pipe_in = Pipe()
-        self._network_comms     = NetworkCommunication(self._network_pipe_in, inbound_ports=self.configuration['ports'], outbound_port=55082)
+        self._network_comms     = AsyncNetworkCommunication(self._network_pipe_in, inbound_ports=self.configuration['ports'], outbound_port=self.configuration['ports']['outbound'], frame_ring=self._frame_ring)
 
-        # Visual display
+        # Visual display, only ever shown the latest frame. Its imaging and GUI dependencies are only imported when used
         self._display_queue_in  = Queue()
         self._display_queue_out = Queue()
-        self._display_class     = StreamFrame(self._display_queue_in, self._display_queue_out)
+        self._display_mailbox   = SharedMailbox()
+        self._display_class     = None
         self._display_process   = None
+        if record is not None:
+            from meleeai.framework.display import HeadlessFrame
+            self._display_class = HeadlessFrame(self._display_queue_in, self._display_queue_out, record, downsample=downsample, frame_ring=self._frame_ring, frame_mailbox=self._display_mailbox)
+        elif self.display:
+            from meleeai.framework.display import StreamFrame
+            self._display_class = StreamFrame(self._display_queue_in, self._display_queue_out, frame_ring=self._frame_ring, frame_mailbox=self._display_mailbox)
 
         self._prediction_engine = None
         self._training_engine   = None
 
+        # Latest decoded Slippi frame and human controller input
+        self._game_state        = None
+        self._controller_state  = None
+
+        # Video, Slippi frames and controller inputs joined in time, the latest being drawn over the display
+        self._synchronizer      = Synchronizer()
+        self._aligned_frame     = None
+
+        # Frame-paced scheduling of the main loop, running until shutdown() or a termination signal
+        self._shutdown          = threading.Event()
+        self.frames             = 0
+        self.missed_deadlines   = 0
+
     def __enter__(self):
         self._network_comms.run()
         return self
@@ -96,31 +140,151 @@ class Engine:
         self._display_queue_out.close()
         self._display_queue_out.join_thread()
 
-        if self._network_pipe_out.poll():
-            self._network_pipe_out.recv()
+        # The network stops writing before the pipe's reading end goes away
+        self._network_comms.stop()
+        try:
+            while self._network_pipe_out.poll():
+                self._network_pipe_out.recv()
+        except EOFError: # the writing end has been closed
+            pass
         self._network_pipe_out.close()
 
-        self._network_comms.stop()
+        if self._frame_ring is not None:
+            self._frame_ring.close()
+        logging.info(f'Ran {self.frames} frames, {self.missed_deadlines} deadlines missed.')
+        logging.info(f'Video frames received: {self._network_comms.video_mailbox.stats()}, displayed: {self._display_mailbox.stats()}.')
+
+    def shutdown(self, *_):
+        """
+        Stops the main loop after the current frame, safe to call from a signal handler or another thread.
+        """
+        self._shutdown.set()
+
+    def _receive(self):
+        # Drain every controller and Slippi message that has arrived, they are never dropped
+        received_frames = False
+        while self._network_pipe_out.poll():
+            message = self._network_pipe_out.recv()
+            self._synchronizer.update(message)
+            _, (message_type, data) = message
+            if message_type == MessageType.SLIPPI:
+                self._game_state = data
+                if self._prediction_engine:
+                    self._prediction_engine.update(data)
+                    received_frames = True
+            elif message_type == MessageType.CONTROLLER:
+                self._controller_state = data
+
+        # Predicted as soon as new Slippi frames arrive rather than once they are aligned with video, the sender
+        # repeating the last state until the next
+        if received_frames:
+            state = self._prediction_engine.predict()
+            if state is not None:
+                self._network_comms.send(state)
+
+    def _frame(self):
+        """
+        Runs the receive -> predict -> send pipeline once, on the latest data of each stream.
+        """
+        self._receive()
+        video = self._network_comms.video_mailbox.take()
+        if video:
+            self._synchronizer.update(video)
+            if self.display:
+                timestamp, (_, sequence) = video
+                self._display_mailbox.put(sequence, timestamp)
+        aligned_frames = self._synchronizer.get_aligned()
+        if aligned_frames:
+            self._aligned_frame = aligned_frames[-1]
+            if self.display:
+                self._display_queue_in.put_nowait((CommandType.OVERLAY, port_states(self._aligned_frame)))
+
+        if self._display_queue_out.qsize():
+            payload = self._display_queue_out.get_nowait()
+            if payload[0] == CommandType.SHUTDOWN:
+                self.display = False
+
+    def _train(self):
+        """
+        Trains the model on the dataset, first converting the configured replays into one if it was never built.
+        """
+        from meleeai.framework.algorithm.dataset import Dataset, DatasetBuilder, INDEX
+        from meleeai.framework.algorithm.hmm import HiddenMarkovModel
+
+        training = self.configuration['training']
+        # A single hidden state predicts the same controller state on every frame
+        n_components = training['n_components']
+        if not isinstance(n_components, int) or n_components < 2:
+            logging.error(f'Training n_components must be a whole number of hidden states, at least 2, not {n_components}.')
+            exit(1)
+
+        if not os.path.exists(os.path.join(training['dataset'], INDEX)):
+            paths = sorted(glob.glob(os.path.join(training['replays'], '**', '*.slp'), recursive=True))
+            DatasetBuilder(training['dataset']).build(paths)
+        self._training_engine = HiddenMarkovModel()
+        self._training_engine.train(Dataset(training['dataset']), n_components=n_components)
+        self._training_engine.save(training['model'])
+        logging.info(f'Saved trained model to {training["model"]}.')
+
+    def _load_prediction(self):
+        """
+        Loads the model trained by _train() to drive Alfred's controller.
+        """
+        model = self.configuration['training']['model']
+        if not os.path.isfile(model):
+            logging.error(f'No trained model at {model}, train Alfred first.')
+            exit(1)
+
+        from meleeai.framework.algorithm.hmm import HiddenMarkovModel
+        from meleeai.framework.algorithm.predictor import Predictor
+        self._prediction_engine = Predictor(HiddenMarkovModel.load(model), port=self.configuration['prediction']['port'])
+        logging.info(f'Loaded trained model from {model}.')
 
     def main(self):
+        if self.train:
+            self._train()
+            if not (self.predict or self.display):
+                return
+        if self.predict:
+            self._load_prediction()
+
         if self.display:
             self._display_process = Process(target=self._display_class.run)
             self._display_process.start()
 
-        # TODO: Network is only sending video. Either split of sift through it.
-        start = datetime.datetime.utcnow()
-        while (datetime.datetime.utcnow() - start).total_seconds() < 3:
-            if self._network_pipe_out.poll():
-                _, (message_type, data) = self._network_pipe_out.recv()
-                if message_type == MessageType.VIDEO and self.display:
-                    if self._display_queue_in.qsize() <= 10:
-                        self._display_queue_in.put_nowait((CommandType.UPDATE, data))
-                if self._display_queue_out.qsize():
-                    payload = self._display_queue_out.get_nowait()
-                    if payload[0] == CommandType.SHUTDOWN:
-                        self.display = False
-        while self._display_queue_in.qsize() > 0:
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                handlers[signum] = signal.signal(signum, self.shutdown)
+
+        # Block on incoming messages between frames, and run the pipeline on every 60 Hz deadline
+        try:
+            deadline = clock.now() + clock.FRAME
+            while not self._shutdown.is_set():
+                remaining = deadline - clock.now()
+                if remaining > 0:
+                    if wait([self._network_pipe_out], clock.to_seconds(remaining)):
+                        self._receive()
+                    continue
+
+                self._frame()
+                self.frames += 1
+
+                # Stay on the frame grid, a frame that overran skips the deadlines it missed
+                deadline += clock.FRAME
+                late = clock.now() - deadline
+                if late > 0:
+                    skipped = late // clock.FRAME + 1
+                    self.missed_deadlines += skipped
+                    deadline += skipped * clock.FRAME
+                    logging.debug(f'Frame {self.frames} overran by {late}us, skipping {skipped} deadlines.')
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        # A display closed by the user won't drain its queue any more
+        while self.display and self._display_queue_in.qsize() > 0:
             time.sleep(.01)
         if self.display:
             logging.info('SENDING shutdown command')
-            self._display_queue_in.put_nowait((CommandType.SHUTDOWN, None))
\ No newline at end of file
+            self._display_queue_in.put_nowait((CommandType.SHUTDOWN, None))
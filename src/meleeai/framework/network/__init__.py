@@ -1 +1,2 @@
+from meleeai.framework.network.async_communication import AsyncNetworkCommunication
 from meleeai.framework.network.communication import NetworkCommunication
\ No newline at end of file
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import socket
+import threading
+
+from meleeai.framework.network.sender import NetworkSender
+from meleeai.framework.network.video_reader import VideoReader
+from meleeai.utils.controller_parser import ControllerParser
+from meleeai.utils.mailbox import Mailbox
+from meleeai.utils.pipe_writer import PipeWriter
+from meleeai.utils.slippi_parser import SlippiParser
+from meleeai.utils.thread_runner import ThreadRunner
+from meleeai.utils.udp import kernel_drops, set_receive_buffer
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+class _ListenerProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, name, parser, forward):
+        """
+        Feeds every datagram received on one port to its parser.
+        :param name: Stream name used for logging.
+        :param parser: Controller or Slippi parser.
+        :param forward: Called with each (timestamp, (MessageType, data)) message decoded.
+        """
+        self.name = name
+        self.parser = parser
+        self.transport = None
+
+        self._forward = forward
+
+    def connection_made(self, transport):
+        self.transport = transport
+        set_receive_buffer(transport.get_extra_info('socket'))
+
+    def error_received(self, exc):
+        logging.warning(f'Error received on {self.name} socket: {exc}')
+
+class _ControllerProtocol(_ListenerProtocol):
+
+    def datagram_received(self, data, addr):
+        packet = self.parser.update(data)
+        if packet:
+            self._forward(packet)
+
+class _SlippiProtocol(_ListenerProtocol):
+
+    def datagram_received(self, data, addr):
+        if self.parser.update(data):
+            for frame in self.parser.get_frames():
+                self._forward(frame)
+
+class AsyncNetworkCommunication(ThreadRunner):
+
+    def __init__(self, network_in, inbound_ports : dict, outbound_port : int, frame_ring=None, video_mailbox=None, use_uvloop=True):
+        """
+        Handles network communication for Alfred on a single asyncio event loop, rather than a thread per socket.
+        Offers the same run() and stop() as NetworkCommunication, plus send() for the outbound controller port, which is
+        paced by its own NetworkSender thread.
+        :param network_in: Pipe for controller and Slippi data to be written to.
+        :param inbound_ports: Controller, Slippi, and Video ports
+        :param outbound_port: Controller port for Alfred prediction
+        :param frame_ring: FrameRing to publish video frames to, video messages then carry the frame's sequence number.
+        :param video_mailbox: Mailbox the latest completed image is posted to, one is created when None.
+        :param use_uvloop: Run on uvloop when it is installed.
+        """
+        if not (isinstance(inbound_ports, dict) and len(set(['controller', 'slippi', 'video']) & set(inbound_ports.keys())) == 3):
+            logging.error('Inbound_ports must be a dictionary of the controller, slippi and video ports.')
+            exit(1)
+
+        if not isinstance(outbound_port, int):
+            logging.error('Outbound_port must be of type int.')
+            exit(1)
+
+        self._network_in = network_in
+        self._inbound_ports = inbound_ports
+        self._outbound_port = outbound_port
+        self._frame_ring = frame_ring
+        self.video_mailbox = video_mailbox if video_mailbox is not None else Mailbox()
+        self._use_uvloop = use_uvloop and uvloop is not None
+
+        self._loop = None
+        self._thread = None
+        self._started = threading.Event()
+        self._protocols = {}
+        self._video_reader = None
+
+        self.network_sender = NetworkSender(outbound_port)
+        # Sends over the pipe block once it fills, which must never stall the event loop and with it every stream
+        self.pipe_writer = PipeWriter(network_in)
+
+    def _forward(self, payload):
+        self.pipe_writer.put(payload)
+
+    async def _open(self):
+        protocols = {
+            'controller' : _ControllerProtocol('controller', ControllerParser(), self._forward),
+            'slippi' : _SlippiProtocol('slippi', SlippiParser(), self._forward)
+        }
+        for name, protocol in protocols.items():
+            await self._loop.create_datagram_endpoint(lambda protocol=protocol: protocol, local_addr=('localhost', self._inbound_ports[name]))
+
+        # Each video frame arrives as a burst of datagrams, drained in batches into one reused buffer rather than
+        # handed over one newly allocated datagram per wakeup as a protocol would be
+        video_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            video_socket.setblocking(False)
+            video_socket.bind(('localhost', self._inbound_ports['video']))
+        except OSError:
+            video_socket.close()
+            raise
+        set_receive_buffer(video_socket)
+        self._video_reader = VideoReader(video_socket, self.video_mailbox, frame_ring=self._frame_ring)
+        self._loop.add_reader(video_socket, self._video_reader.drain)
+        self._protocols = protocols
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._open())
+        except OSError:
+            logging.exception('Failed to open network endpoints.')
+            self._loop.close()
+            return
+        finally:
+            self._started.set()
+        self._loop.run_forever()
+
+        for protocol in self._protocols.values():
+            protocol.transport.close()
+        self._loop.remove_reader(self._video_reader.socket)
+        self._video_reader.socket.close()
+        # Let the transports finish closing before the loop goes away
+        self._loop.run_until_complete(asyncio.sleep(0))
+        self._loop.close()
+
+    def dropped_datagrams(self):
+        """
+        Gets the datagrams the kernel dropped on each port because a receive buffer overflowed.
+        :return: Dictionary of stream to dropped count, None where the platform doesn't expose it.
+        """
+        dropped = {name : kernel_drops(protocol.transport.get_extra_info('socket')) for name, protocol in self._protocols.items()}
+        dropped['video'] = kernel_drops(self._video_reader.socket)
+        return dropped
+
+    def send(self, state):
+        """
+        Sets the controller state sent to the outbound controller port from the next frame on, callable from any thread.
+        :param state: ControllerState to send.
+        """
+        self.network_sender.submit(state)
+
+    def run(self):
+        self._loop = uvloop.new_event_loop() if self._use_uvloop else asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.start()
+        self._started.wait()
+        self.pipe_writer.run()
+        self.network_sender.run()
+        logging.info(f'Started Network Communication event loop{" on uvloop" if self._use_uvloop else ""}.')
+
+    def stop(self):
+        self.network_sender.stop()
+        if self._protocols:
+            logging.info(f'Kernel dropped datagrams: {self.dropped_datagrams()}.')
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self.pipe_writer.stop()
+
+        controller_parser = self._protocols['controller'].parser if self._protocols else None
+        if controller_parser:
+            logging.info(f'Controller listener dropped {controller_parser.lost_packets} lost and {controller_parser.late_packets} late packets.')
+            logging.info(f'Video listener evicted {self._video_reader.parser.evicted_frames} incomplete frames.')
+        logging.info('Stopped Network Communication event loop.')
@@ -5,15 +5,18 @@ from io import BytesIO
 
 from meleeai.utils.thread_runner import ThreadRunner
 from meleeai.framework.network.receiver import NetworkReceiver
+from meleeai.framework.network.sender import NetworkSender
 
 class NetworkCommunication(ThreadRunner):
 
-    def __init__(self, network_in, inbound_ports : dict, outbound_port : int):
+    def __init__(self, network_in, inbound_ports : dict, outbound_port : int, frame_ring=None, video_mailbox=None):
         """
         Hanldes network communication for Alfred by providing a simple API of receive() and send()
         :param network_in: Pipe for network data to be written to amongst the three threads.
         :param inbound_ports: Controller, Slippi, and Video ports
         :param outbound_port: Controller port for Alfred prediction
+        :param frame_ring: FrameRing to publish video frames to, video messages then carry the frame's sequence number.
+        :param video_mailbox: Mailbox the latest completed image is posted to, one is created when None.
         """
         if not (isinstance(inbound_ports, dict) or len(inbound_ports.keys()) != 3):
             logging.error('Inbound_ports must be of type list and of length 3.')
@@ -28,11 +31,22 @@ class NetworkCommunication(ThreadRunner):
         self._output_ports = outbound_port
 
         # Objects known to NetworkCommunication
-        self.network_receiver = NetworkReceiver(network_in, self._inbound_ports)
+        self.network_receiver = NetworkReceiver(network_in, self._inbound_ports, video_mailbox=video_mailbox, frame_ring=frame_ring)
+        self.video_mailbox = self.network_receiver.video_mailbox
+        self.network_sender = NetworkSender(self._output_ports)
+
+    def send(self, state):
+        """
+        Sets the controller state sent to the outbound controller port from the next frame on.
+        :param state: ControllerState to send.
+        """
+        self.network_sender.submit(state)
 
     def run(self):
         self.network_receiver.run()
+        self.network_sender.run()
         logging.info('Starting Network Communication thread runners.')        
 
     def stop(self):
+        self.network_sender.stop()
         self.network_receiver.stop()
\ No newline at end of file
@@ -1,53 +1,131 @@
 import heapq
 import logging
+import selectors
 import socket
-import time
 import threading
 
-from meleeai.utils.video_parser import VideoParser
+from meleeai.framework.network.video_reader import VideoReader
+from meleeai.utils.controller_parser import ControllerParser
+from meleeai.utils.mailbox import Mailbox
+from meleeai.utils.slippi_parser import SlippiParser
 from meleeai.utils.thread_runner import ThreadRunner
+from meleeai.utils.udp import RECEIVE_BUFFER_SIZE, kernel_drops, set_receive_buffer
 
 class NetworkReceiver(ThreadRunner):
 
-    def __init__(self, network_in, configured_ports):
+    def __init__(self, network_in, configured_ports, video_mailbox=None, frame_ring=None, receive_buffer_size=RECEIVE_BUFFER_SIZE, BATCH_SIZE=64):
+        """
+        Listens on the controller, Slippi and video ports, forwarding decoded messages down a single pipe.
+        :param network_in: Pipe for controller and Slippi data to be written to amongst the threads.
+        :param configured_ports: Controller, Slippi, and Video ports
+        :param video_mailbox: Mailbox the latest completed image is posted to, one is created when None.
+        :param frame_ring: FrameRing to publish video frames to, video messages then carry the frame's sequence number.
+        :param receive_buffer_size: Kernel receive buffer requested for each socket.
+        :param BATCH_SIZE: Most video datagrams drained per wakeup before checking for completed images.
+        """
+        self.video_mailbox = video_mailbox if video_mailbox is not None else Mailbox()
 
         self._network_in = network_in
+        self._network_lock = threading.Lock()
+
+        # Setup controller port
+        self.controller_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.controller_socket.bind(('localhost', configured_ports['controller']))
+        self.controller_socket.settimeout(1)
+        set_receive_buffer(self.controller_socket, receive_buffer_size)
+
+        # Setup slippi port
+        self.slippi_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.slippi_socket.bind(('localhost', configured_ports['slippi']))
+        self.slippi_socket.settimeout(1)
+        set_receive_buffer(self.slippi_socket, receive_buffer_size)
 
         # Setup video port
         self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.video_socket.bind(('localhost', configured_ports['video']))
-        self.video_socket.settimeout(1)
+        self.video_socket.setblocking(False)
+        set_receive_buffer(self.video_socket, receive_buffer_size)
+        self._video_reader = VideoReader(self.video_socket, self.video_mailbox, frame_ring=frame_ring, BATCH_SIZE=BATCH_SIZE)
 
         self._controller_thread = None
         self._slippi_thread     = None
         self._video_thread      = None
         self._run               = True
 
-    def _listen_video(self):
-        video_parser = VideoParser()
+    def _send(self, payload):
+        # Connection.send is not thread safe, and every listener shares the one pipe.
+        with self._network_lock:
+            if not self._network_in.closed and self._network_in.writable:
+                self._network_in.send(payload)
+
+    def _listen_controller(self):
+        controller_parser = ControllerParser()
+        data = bytearray(controller_parser.PACKET_SIZE)
+        while self._run:
+            try:
+                # Decoded straight out of a reused buffer, and forwarded the moment it arrives.
+                size = self.controller_socket.recv_into(data)
+                packet = controller_parser.update(memoryview(data)[:size])
+                if packet:
+                    self._send(packet)
+            except socket.timeout:
+                logging.warning('Failed to receive any data from controller socket.')
+        logging.info(f'Controller listener dropped {controller_parser.lost_packets} lost and {controller_parser.late_packets} late packets.')
+
+    def _listen_slippi(self):
+        slippi_parser = SlippiParser()
         while self._run:
             try:
-                data_str, _ = self.video_socket.recvfrom((2**16) - 1)
-                if video_parser.update(data_str):
-                    if not self._network_in.closed and self._network_in.writable and not self._network_in.poll():
-                        self._network_in.send(video_parser.get_completed_images()[0])
+                data_str, _ = self.slippi_socket.recvfrom((2**16) - 1)
+                if slippi_parser.update(data_str):
+                    for frame in slippi_parser.get_frames():
+                        self._send(frame)
             except socket.timeout:
-                logging.warning('Failed to receive any data from video socket.')    
-            
-            time.sleep(.001)
+                logging.warning('Failed to receive any data from slippi socket.')
+
+    def _listen_video(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.video_socket, selectors.EVENT_READ)
+        while self._run:
+            if not selector.select(timeout=1):
+                logging.warning('Failed to receive any data from video socket.')
+                continue
+            self._video_reader.drain()
+        selector.close()
+        logging.info(f'Video listener evicted {self._video_reader.parser.evicted_frames} incomplete frames.')
+
+    def dropped_datagrams(self):
+        """
+        Gets the datagrams the kernel dropped on each port because a receive buffer overflowed.
+        :return: Dictionary of stream to dropped count, None where the platform doesn't expose it.
+        """
+        return {
+            'controller' : kernel_drops(self.controller_socket),
+            'slippi' : kernel_drops(self.slippi_socket),
+            'video' : kernel_drops(self.video_socket)
+        }
 
     def run(self):
         self._run = True
+        self._controller_thread = threading.Thread(target=self._listen_controller)
+        self._slippi_thread = threading.Thread(target=self._listen_slippi)
         self._video_thread = threading.Thread(target=self._listen_video)
-        
+
+        self._controller_thread.start()
+        self._slippi_thread.start()
         self._video_thread.start()
         logging.info('Started Network Communication Receiver thread.')        
 
     def stop(self):
-        self._network_in.close()
-
         self._run = False
+        with self._network_lock:
+            self._network_in.close()
         logging.info('Stopped Network Communication Receiver, awaiting thread completion.')
 
+        self._controller_thread.join()
+        self._slippi_thread.join()
         self._video_thread.join()
+        logging.info(f'Kernel dropped datagrams: {self.dropped_datagrams()}.')
+        for sock in (self.controller_socket, self.slippi_socket, self.video_socket):
+            sock.close()
         logging.info('Successfully joined all threads, exiting Network Communication Receiver.')
\ No newline at end of file
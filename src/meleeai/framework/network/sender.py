@@ -1,12 +1,127 @@
+import logging
+import socket
+import struct
+import threading
+import time
+
+from meleeai.utils import clock
+from meleeai.utils.controller_parser import PACKET
 from meleeai.utils.thread_runner import ThreadRunner
 
+# The sequence number leading each controller packet.
+SEQUENCE = struct.Struct('>I')
+
 class NetworkSender(ThreadRunner):
 
-    def __init__(self, outbound_port):
-        pass
+    def __init__(self, outbound_port, host='localhost', POOL_SIZE=8, FRAME=clock.FRAME, SPIN=1000, BIN_SIZE=50, BINS=100):
+        """
+        Sends Alfred's controller state once per Melee frame, in the packet format ControllerParser decodes. Packets are
+        encoded ahead of time into a pool of preallocated buffers, the send thread only stamps a sequence number and sends.
+        :param outbound_port: Controller port for Alfred prediction
+        :param host: Host the controller packets are sent to.
+        :param POOL_SIZE: Packet buffers cycled through by submit().
+        :param FRAME: Microseconds between sends.
+        :param SPIN: Microseconds before each deadline spent spinning rather than sleeping, trading CPU for accuracy.
+        :param BIN_SIZE: Width in microseconds of each send jitter histogram bin.
+        :param BINS: Number of jitter histogram bins, the last counting everything beyond.
+        """
+        self.POOL_SIZE          = POOL_SIZE
+        self.FRAME              = FRAME
+        self.SPIN               = SPIN
+        self.BIN_SIZE           = BIN_SIZE
+
+        self.sent_packets       = 0
+        self.missed_deadlines   = 0
+        self.jitter_histogram   = [0] * BINS
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.connect((host, outbound_port))
+
+        self._pool = [bytearray(PACKET.size) for _ in range(POOL_SIZE)]
+        self._next = 0
+        # Index of the latest submitted packet, swapped in one assignment so the send thread never sees a partial packet
+        self._current = None
+        # Set by the first submit(), the send thread sleeps on it until there is anything to send
+        self._submitted = threading.Event()
+
+        self._thread = None
+        self._run = False
+
+    def submit(self, state):
+        """
+        Encodes a controller state to be sent from the next frame on, replacing the previous one.
+        :param state: ControllerState, or any sequence of its fields; the sequence number is assigned when sent.
+        """
+        index = self._next
+        PACKET.pack_into(self._pool[index], 0, 0, state[1], state[2], state[3], state[4], state[5], state[6], state[7], int(state[8]))
+        self._current = index
+        self._next = (index + 1) % self.POOL_SIZE
+        if not self._submitted.is_set():
+            self._submitted.set()
+
+    def _wait(self, deadline):
+        remaining = deadline - clock.now()
+        if remaining > self.SPIN:
+            time.sleep((remaining - self.SPIN) / clock.MICROSECONDS)
+        while clock.now() < deadline:
+            pass
+
+    def _send_loop(self):
+        # Keeping time costs a spin every frame, so nothing is paced until the first packet is submitted
+        self._submitted.wait()
+        sequence = 1
+        deadline = clock.now()
+        while self._run:
+            self._wait(deadline)
+            packet = self._pool[self._current]
+            SEQUENCE.pack_into(packet, 0, sequence)
+            sent = clock.now()
+            try:
+                self._socket.send(packet)
+                self.sent_packets += 1
+                sequence += 1
+            except ConnectionRefusedError:
+                # Nothing is listening on the outbound port yet, the packet is simply lost as it would be over UDP
+                pass
+            except OSError as error:
+                logging.warning(f'Failed to send controller packet: {error}')
+            jitter = sent - deadline
+            self.jitter_histogram[min(jitter // self.BIN_SIZE, len(self.jitter_histogram) - 1)] += 1
+
+            # Stay locked to the frame grid, skipping whole frames if a deadline was missed entirely
+            deadline += self.FRAME
+            late = clock.now() - deadline
+            if late > 0:
+                skipped = late // self.FRAME + 1
+                self.missed_deadlines += skipped
+                deadline += skipped * self.FRAME
+
+    def jitter_percentile(self, percentile):
+        """
+        Gets the send jitter, in microseconds after the deadline, that the given percentage of sends came within.
+        """
+        total = sum(self.jitter_histogram)
+        if not total:
+            return 0
+        target = total * percentile / 100
+        count = 0
+        for index, bin_count in enumerate(self.jitter_histogram):
+            count += bin_count
+            if count >= target:
+                return (index + 1) * self.BIN_SIZE
+        return len(self.jitter_histogram) * self.BIN_SIZE
 
     def run(self):
-        print('run')
+        self._run = True
+        self._thread = threading.Thread(target=self._send_loop)
+        self._thread.start()
+        logging.info('Started Network Communication Sender thread.')
 
     def stop(self):
-        print('stop')
\ No newline at end of file
+        self._run = False
+        # Wakes a thread still waiting for its first packet
+        self._submitted.set()
+        if self._thread:
+            self._thread.join()
+        self._socket.close()
+        logging.info(f'Sent {self.sent_packets} controller packets, {self.missed_deadlines} deadlines missed, jitter p50 {self.jitter_percentile(50)}us p99 {self.jitter_percentile(99)}us.')
@@ -0,0 +1,48 @@
+import logging
+
+from meleeai.utils.video_parser import VideoParser
+
+class VideoReader:
+
+    def __init__(self, sock, mailbox, frame_ring=None, BATCH_SIZE=64):
+        """
+        Reads video datagrams from a non-blocking socket into one reused buffer, posting the latest completed image.
+        :param sock: Bound, non-blocking video socket.
+        :param mailbox: Mailbox the latest completed image is posted to.
+        :param frame_ring: FrameRing images are published to, only their sequence number being posted, if any.
+        :param BATCH_SIZE: Most datagrams drained per call before checking for completed images.
+        """
+        self.socket = sock
+        self.parser = VideoParser()
+        self.BATCH_SIZE         = BATCH_SIZE
+
+        self._mailbox = mailbox
+        self._frame_ring = frame_ring
+        self._data = bytearray((2**16) - 1)
+        self._view = memoryview(self._data)
+
+    def drain(self):
+        """
+        Reads every datagram already queued on the socket, up to BATCH_SIZE, without blocking.
+        """
+        completed = False
+        for _ in range(self.BATCH_SIZE):
+            try:
+                # Segments are copied straight from this buffer into their frame's buffer.
+                size = self.socket.recv_into(self._data)
+            except BlockingIOError:
+                break
+            except OSError as error:
+                logging.warning(f'Error received on video socket: {error}')
+                break
+            completed |= self.parser.update(self._view[:size])
+        if not completed:
+            return
+
+        # Only the newest image matters, older ones completed in the same batch are superseded
+        timestamp, (message_type, image) = self.parser.get_completed_images()[-1]
+        if self._frame_ring is not None:
+            image = self._frame_ring.publish(timestamp, image)
+            if image is None:
+                return
+        self._mailbox.put((timestamp, (message_type, image)))
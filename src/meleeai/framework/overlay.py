@@ -0,0 +1,87 @@
+"""
+    Draws decoded Slippi state over video frames, for checking that video and game state line up. Every piece of
+    text is rendered once into a mask and then only pasted, so drawing a frame costs well under a millisecond.
+"""
+
+from PIL import Image, ImageDraw, ImageFont
+
+from slippi.event import Buttons
+from slippi.id import ActionState
+
+PORT_COLORS = ((230, 60, 60), (60, 110, 230), (240, 200, 40), (60, 190, 90))
+
+BUTTON_NAMES = tuple((button, button.name.replace('DPAD_', 'D').replace('START', 'S')) for button in Buttons.Physical if button)
+
+class Overlay:
+
+    def __init__(self, BOUNDS=(-250, 250, -150, 200), font=None):
+        """
+        :param BOUNDS: Left, right, bottom and top of the area of the stage the video shows, in game units.
+        :param font: PIL font to render text with, Pillow's default font when None.
+        """
+        self.BOUNDS             = BOUNDS
+
+        self._font = font if font is not None else ImageFont.load_default()
+        self._glyphs = {}
+
+        # Glyph atlas for numbers and button names rendered up front. Action state names are looked up once here, their
+        # masks are rendered the first time each state is seen, as there are hundreds of them.
+        for character in '0123456789%.-':
+            self._glyphs[character] = self._render(character)
+        self._state_names = {int(state) : state.name for state in ActionState}
+        self._states = {}
+        self._buttons = [(int(button), self._render(name)) for button, name in BUTTON_NAMES]
+        self.LINE_HEIGHT = max(mask.height for mask in self._glyphs.values()) + 2
+
+    def _render(self, text):
+        left, top, right, bottom = self._font.getbbox(text)
+        mask = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=self._font)
+        return mask
+
+    def _text(self, image, position, mask, color):
+        image.paste(color, (position[0], position[1], position[0] + mask.width, position[1] + mask.height), mask)
+        return position[0] + mask.width
+
+    def _number(self, image, position, text, color):
+        x, y = position
+        for character in text:
+            glyph = self._glyphs.get(character)
+            if glyph is None:
+                glyph = self._glyphs[character] = self._render(character)
+            x = self._text(image, (x, y), glyph, color) + 1
+        return x
+
+    def _to_image(self, image, x, y):
+        left, right, bottom, top = self.BOUNDS
+        return int((x - left) / (right - left) * image.width), int((top - y) / (top - bottom) * image.height)
+
+    def draw(self, image, states):
+        """
+        Draws each port's position marker, damage, action state, stocks and held buttons onto the image in place.
+        :param image: RGB PIL image.
+        :param states: Tuple of PortState by port, as from port_states().
+        """
+        for port, state in enumerate(states):
+            if state is None:
+                continue
+            color = PORT_COLORS[port % len(PORT_COLORS)]
+
+            # Marker at the character's position
+            x, y = self._to_image(image, state.x, state.y)
+            image.paste(color, (x - 3, y - 3, x + 4, y + 4))
+
+            # Status panel along the bottom, a quarter of the width per port
+            panel_x = port * image.width // 4 + 4
+            panel_y = image.height - 3 * self.LINE_HEIGHT - 4
+            end = self._number(image, (panel_x, panel_y), f'{state.damage:.0f}%', color)
+            for stock in range(state.stocks):
+                image.paste(color, (end + 4 + stock * 6, panel_y + 2, end + 8 + stock * 6, panel_y + 6))
+            state_mask = self._states.get(state.state)
+            if state_mask is None:
+                state_mask = self._states[state.state] = self._render(self._state_names.get(state.state, str(state.state)))
+            self._text(image, (panel_x, panel_y + self.LINE_HEIGHT), state_mask, color)
+            button_x = panel_x
+            for button, mask in self._buttons:
+                if state.buttons & button:
+                    button_x = self._text(image, (button_x, panel_y + 2 * self.LINE_HEIGHT), mask, color) + 3
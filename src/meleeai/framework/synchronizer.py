@@ -0,0 +1,171 @@
+import collections
+import logging
+
+from meleeai.utils import clock
+from meleeai.utils.message_type import MessageType
+
+# Pre and post hold each port's leader data by port, None for empty ports. Image and controller are None when nothing
+# arrived within tolerance of the Slippi frame.
+AlignedFrame = collections.namedtuple('AlignedFrame', ['frame_index', 'timestamp', 'image', 'pre', 'post', 'controller'])
+
+# Compact per-port state sent to the display each frame, cheap to pickle. Buttons is the physical button bitmask.
+PortState = collections.namedtuple('PortState', ['x', 'y', 'damage', 'state', 'stocks', 'buttons'])
+
+def port_states(aligned_frame):
+    """
+    Extracts the state drawn by the overlay from an AlignedFrame.
+    :return: Tuple of PortState by port, None for empty ports.
+    """
+    states = []
+    for pre, post in zip(aligned_frame.pre, aligned_frame.post):
+        if post is None:
+            states.append(None)
+            continue
+        states.append(PortState(post.position.x, post.position.y, post.damage, int(post.state), post.stocks, int(pre.buttons.physical) if pre else 0))
+    return tuple(states)
+
+class TimeRing:
+
+    def __init__(self, CAPACITY=64):
+        """
+        Fixed-capacity ring of timestamped values in timestamp order, the oldest being overwritten once full.
+        :param CAPACITY: Values held at once.
+        """
+        self.CAPACITY           = CAPACITY
+
+        self.out_of_order       = 0
+
+        self._timestamps = [0] * CAPACITY
+        self._values = [None] * CAPACITY
+        # Absolute positions of the oldest value and one past the newest, the slot is the position modulo CAPACITY
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def newest(self):
+        """
+        Gets the newest timestamp, or None if the ring is empty.
+        """
+        return self._timestamps[(self._end - 1) % self.CAPACITY] if self._end > self._start else None
+
+    def append(self, timestamp, value):
+        """
+        Adds a value, which must not be older than the newest one held.
+        :return: Whether the value was added.
+        """
+        if self._end > self._start and timestamp < self.newest():
+            self.out_of_order += 1
+            return False
+        slot = self._end % self.CAPACITY
+        self._timestamps[slot] = timestamp
+        self._values[slot] = value
+        self._end += 1
+        if self._end - self._start > self.CAPACITY:
+            self._start += 1
+        return True
+
+    def nearest(self, timestamp, tolerance):
+        """
+        Binary searches for the value closest in time.
+        :param timestamp: Timestamp to match.
+        :param tolerance: Largest difference from timestamp accepted.
+        :return: (timestamp, value), or None if nothing is within tolerance.
+        """
+        low, high = self._start, self._end
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[middle % self.CAPACITY] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        # low is now the first value at or after timestamp, so the nearest is it or the one before
+        best = None
+        for position in (low - 1, low):
+            if self._start <= position < self._end:
+                difference = abs(self._timestamps[position % self.CAPACITY] - timestamp)
+                if difference <= tolerance and (best is None or difference < best[0]):
+                    best = (difference, position)
+        if best is None:
+            return None
+        slot = best[1] % self.CAPACITY
+        return self._timestamps[slot], self._values[slot]
+
+    def clear(self):
+        self._values = [None] * self.CAPACITY
+        self._start = self._end = 0
+
+class Synchronizer:
+
+    def __init__(self, TOLERANCE=clock.FRAME // 2, MAX_LAG=6 * clock.FRAME, CAPACITY=64):
+        """
+        Joins video, Slippi frames and controller inputs by nearest timestamp. Each stream is buffered in a TimeRing,
+        and every Slippi frame is emitted once, along with the image and controller state closest to it in time.
+        :param TOLERANCE: Largest time difference in microseconds for an image or controller state to match a Slippi
+                          frame. Half a Melee frame by default.
+        :param MAX_LAG: Longest a Slippi frame waits for a later image before being emitted with what has arrived,
+                        in microseconds.
+        :param CAPACITY: Messages buffered per stream.
+        """
+        self.TOLERANCE          = TOLERANCE
+        self.MAX_LAG            = MAX_LAG
+
+        self.emitted_frames     = 0
+        self.unmatched_images   = 0
+
+        self._video = TimeRing(CAPACITY)
+        self._controller = TimeRing(CAPACITY)
+        self._slippi = TimeRing(CAPACITY)
+        self._pending = collections.deque(maxlen=CAPACITY)
+
+    def clear(self):
+        self._video.clear()
+        self._controller.clear()
+        self._slippi.clear()
+        self._pending.clear()
+
+    def update(self, message):
+        """
+        Buffers a message from any stream.
+        :param message: (timestamp, (MessageType, data)) as produced by the parsers.
+        """
+        timestamp, (message_type, data) = message
+        if message_type == MessageType.VIDEO:
+            self._video.append(timestamp, data)
+        elif message_type == MessageType.CONTROLLER:
+            self._controller.append(timestamp, data)
+        elif message_type == MessageType.SLIPPI:
+            if self._slippi.append(timestamp, data):
+                self._pending.append((timestamp, data))
+        else:
+            logging.warning(f'Synchronizer cannot align messages of type {message_type}.')
+
+    def _align(self, timestamp, frame):
+        image = self._video.nearest(timestamp, self.TOLERANCE)
+        controller = self._controller.nearest(timestamp, self.TOLERANCE)
+        if image is None:
+            self.unmatched_images += 1
+        self.emitted_frames += 1
+        return AlignedFrame(
+            frame.index,
+            timestamp,
+            image[1] if image else None,
+            tuple(port.leader.pre if port else None for port in frame.ports),
+            tuple(port.leader.post if port else None for port in frame.ports),
+            controller[1] if controller else None)
+
+    def get_aligned(self):
+        """
+        Gets the Slippi frames that can no longer be matched any better, in order, each as an AlignedFrame. A frame
+        is ready once an image later than its tolerance has arrived, or once it lags the newest frame by MAX_LAG.
+        """
+        aligned = []
+        newest_image, newest_frame = self._video.newest(), self._slippi.newest()
+        while self._pending:
+            timestamp, frame = self._pending[0]
+            if not ((newest_image is not None and newest_image > timestamp + self.TOLERANCE) or newest_frame - timestamp > self.MAX_LAG):
+                break
+            self._pending.popleft()
+            aligned.append(self._align(timestamp, frame))
+        return aligned
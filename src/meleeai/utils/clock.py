@@ -0,0 +1,32 @@
+"""
+    Alfred's clock. Every message is stamped with a 64-bit integer count of microseconds on the monotonic clock, so
+    messages from different streams can be ordered and compared with integer arithmetic.
+"""
+
+import time
+
+MICROSECONDS = 10**6
+
+# One Melee frame, the game runs at 60 frames per second.
+FRAME = MICROSECONDS // 60
+
+def now():
+    """
+    Gets the current time in microseconds on the monotonic clock shared by every stream.
+    """
+    return time.monotonic_ns() // 1000
+
+def from_seconds(seconds):
+    """
+    Converts a duration in seconds to microseconds.
+    """
+    return int(seconds * MICROSECONDS)
+
+def to_seconds(microseconds):
+    return microseconds / MICROSECONDS
+
+def from_timeval(seconds, microseconds):
+    """
+    Combines a timeval's seconds and microseconds fields into microseconds.
+    """
+    return seconds * MICROSECONDS + microseconds
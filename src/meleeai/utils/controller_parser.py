@@ -0,0 +1,55 @@
+import collections
+import logging
+import struct
+
+from slippi.event import Buttons
+
+from meleeai.utils import clock
+from meleeai.utils.message_type import MessageType
+
+# Sequence number, controller port, joystick x/y, c-stick x/y, physical L/R triggers and the physical button bitmask.
+PACKET = struct.Struct('>I B 6f H')
+
+ControllerState = collections.namedtuple('ControllerState', ['sequence', 'port', 'joystick_x', 'joystick_y', 'cstick_x', 'cstick_y', 'trigger_l', 'trigger_r', 'buttons'])
+
+class ControllerParser:
+
+    def __init__(self):
+        """
+        Decodes fixed-layout controller packets, stamping each with the time it was received.
+        """
+        self.PACKET_SIZE        = PACKET.size
+        self.PACKET_UNPACK      = PACKET.unpack_from
+
+        self.lost_packets       = 0
+        self.late_packets       = 0
+
+        self._sequence = None
+
+    def clear(self):
+        self._sequence = None
+
+    def update(self, data_str):
+        """
+        Decodes a single packet.
+        :param data_str: Bytes-like object holding the packet.
+        :return: (timestamp, (MessageType.CONTROLLER, ControllerState)), or None if the packet was rejected.
+        """
+        timestamp = clock.now()
+        if len(data_str) < self.PACKET_SIZE:
+            logging.error('Data string provided is too small for controller packet to parse.')
+            return None
+        state = self.PACKET_UNPACK(data_str)
+
+        # Only ever move forward, a reordered packet is older than what has already been forwarded.
+        sequence = state[0]
+        if sequence == 0:
+            self.clear()
+        if self._sequence is not None:
+            if sequence <= self._sequence:
+                self.late_packets += 1
+                return None
+            self.lost_packets += sequence - self._sequence - 1
+        self._sequence = sequence
+
+        return (timestamp, (MessageType.CONTROLLER, ControllerState(*state[:-1], Buttons.Physical(state[-1]))))
@@ -0,0 +1,83 @@
+"""
+    Stand-in for the controller Alfred's predictions are sent to. Receives controller packets on a local port,
+    recording each decoded state with the time it arrived, for testing the outbound path offline.
+"""
+
+import argparse
+import collections
+import logging
+import socket
+import threading
+
+from meleeai.utils import clock
+from meleeai.utils.controller_parser import ControllerParser
+from meleeai.utils.thread_runner import ThreadRunner
+
+class ControllerSink(ThreadRunner):
+
+    def __init__(self, port, host='localhost', MAX_SIZE=3600):
+        """
+        :param port: Port to receive controller packets on, Alfred's configured outbound port.
+        :param host: Host to bind to.
+        :param MAX_SIZE: Most recent states kept in received.
+        """
+        self.parser = ControllerParser()
+        self.received = collections.deque(maxlen=MAX_SIZE)
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(.1)
+        self._thread = None
+        self._run = False
+
+    def intervals(self):
+        """
+        Gets the microseconds between consecutive packets received.
+        """
+        timestamps = [timestamp for timestamp, _ in self.received]
+        return [later - earlier for earlier, later in zip(timestamps, timestamps[1:])]
+
+    def _listen(self):
+        data = bytearray(self.parser.PACKET_SIZE)
+        while self._run:
+            try:
+                size = self._socket.recv_into(data)
+            except socket.timeout:
+                continue
+            packet = self.parser.update(memoryview(data)[:size])
+            if packet:
+                timestamp, (_, state) = packet
+                self.received.append((timestamp, state))
+
+    def run(self):
+        self._run = True
+        self._thread = threading.Thread(target=self._listen)
+        self._thread.start()
+
+    def stop(self):
+        self._run = False
+        if self._thread:
+            self._thread.join()
+        self._socket.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Receives controller packets sent by Alfred and reports their timing.')
+    parser.add_argument('-p', '--port', default=55082, type=int, help='Port to listen on, Alfred\'s configured outbound port.')
+    parser.add_argument('-s', '--seconds', default=10, type=float, help='Seconds to listen for.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    sink = ControllerSink(args.port)
+    sink.run()
+    try:
+        threading.Event().wait(args.seconds)
+    finally:
+        sink.stop()
+
+    intervals = sorted(sink.intervals())
+    logging.info(f'Received {len(sink.received)} packets, {sink.parser.lost_packets} lost and {sink.parser.late_packets} late.')
+    if intervals:
+        logging.info(f'Interval median {intervals[len(intervals) // 2]}us, min {intervals[0]}us, max {intervals[-1]}us, frame is {clock.FRAME}us.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import logging
+import os
+import struct
+
+from multiprocessing import shared_memory
+
+# Sequence number of the most recently published frame.
+RING_HEADER = struct.Struct('<Q')
+# Sequence number, timestamp and length of the frame held in a slot. A sequence of 0 marks the slot as being written.
+SLOT_HEADER = struct.Struct('<QqI4x')
+
+class FrameRing:
+
+    def __init__(self, SLOTS=8, SLOT_SIZE=2**23, name=None):
+        """
+        Ring of fixed-size frame slots in shared memory, written by a single producer and read by any process.
+        Frames are published once into a slot; only their sequence number needs to be passed between processes.
+        :param SLOTS: Number of frames held before the oldest is overwritten.
+        :param SLOT_SIZE: Largest frame in bytes a slot can hold.
+        :param name: Name of an existing ring to attach to, a new one is created when None.
+        """
+        self.SLOTS              = SLOTS
+        self.SLOT_SIZE          = SLOT_SIZE
+        self.SLOT_STRIDE        = SLOT_HEADER.size + SLOT_SIZE
+
+        # Only the creating process unlinks the memory, a forked child inherits this object as is.
+        self._owner = os.getpid() if name is None else None
+        size = RING_HEADER.size + SLOTS * self.SLOT_STRIDE
+        self._memory = shared_memory.SharedMemory(name=name, create=name is None, size=size if name is None else 0)
+        self._buf = self._memory.buf
+        if name is None:
+            RING_HEADER.pack_into(self._buf, 0, 0)
+
+    def __getstate__(self):
+        # Attach to the same memory rather than copying it when sent to another process.
+        return (self.name, self.SLOTS, self.SLOT_SIZE)
+
+    def __setstate__(self, state):
+        name, slots, slot_size = state
+        self.__init__(SLOTS=slots, SLOT_SIZE=slot_size, name=name)
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    def _offset(self, sequence):
+        return RING_HEADER.size + (sequence % self.SLOTS) * self.SLOT_STRIDE
+
+    def latest(self):
+        """
+        Gets the sequence number of the most recently published frame, 0 if none has been.
+        """
+        return RING_HEADER.unpack_from(self._buf, 0)[0]
+
+    def publish(self, timestamp, data):
+        """
+        Copies a frame into the next slot, overwriting the oldest frame. Only one process may publish.
+        :param timestamp: Timestamp of the frame.
+        :param data: Bytes-like object holding the frame.
+        :return: Sequence number of the frame, or None if it is too large for a slot.
+        """
+        size = len(data)
+        if size > self.SLOT_SIZE:
+            logging.error(f'Frame of {size} bytes does not fit in a {self.SLOT_SIZE} byte slot.')
+            return None
+        sequence = self.latest() + 1
+        offset = self._offset(sequence)
+        SLOT_HEADER.pack_into(self._buf, offset, 0, timestamp, size)
+        start = offset + SLOT_HEADER.size
+        self._buf[start:start + size] = data
+        SLOT_HEADER.pack_into(self._buf, offset, sequence, timestamp, size)
+        RING_HEADER.pack_into(self._buf, 0, sequence)
+        return sequence
+
+    def get(self, sequence):
+        """
+        Maps a published frame without copying it. The frame may be overwritten while it is in use, call
+        is_valid() once done with it, and release the view before closing the ring.
+        :param sequence: Sequence number returned by publish().
+        :return: (timestamp, memoryview), or None if the frame has already been overwritten.
+        """
+        offset = self._offset(sequence)
+        stored, timestamp, size = SLOT_HEADER.unpack_from(self._buf, offset)
+        if stored != sequence:
+            return None
+        start = offset + SLOT_HEADER.size
+        return timestamp, self._buf[start:start + size].toreadonly()
+
+    def is_valid(self, sequence):
+        """
+        Checks that a frame has not been overwritten, or begun to be, since it was published.
+        """
+        return SLOT_HEADER.unpack_from(self._buf, self._offset(sequence))[0] == sequence
+
+    def close(self):
+        self._buf = None
+        self._memory.close()
+        if self._owner == os.getpid():
+            self._memory.unlink()
@@ -0,0 +1,108 @@
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+class FrameWriter:
+
+    def __init__(self, path, fps=60, downsample=1, MAX_SIZE=8):
+        """
+        Encodes frames to an mp4 file or a directory of PNGs on a background thread, so writing never holds up the
+        caller. Frames arriving while the queue is full are dropped and counted rather than waited on.
+        :param path: Output mp4 file (ffmpeg must be installed), otherwise a directory the PNG sequence is written to.
+        :param fps: Frame rate of the mp4.
+        :param downsample: Integer factor each dimension is reduced by before encoding.
+        :param MAX_SIZE: Frames queued for encoding at once.
+        """
+        self.path = path
+        self.fps = fps
+        self.downsample = downsample
+
+        self.written_frames     = 0
+        self.dropped_frames     = 0
+
+        self._queue = queue.Queue(maxsize=MAX_SIZE)
+        self._encoder = None
+        if os.path.splitext(path)[1].lower() == '.mp4':
+            if shutil.which('ffmpeg') is None:
+                raise RuntimeError('Writing mp4 requires ffmpeg to be installed, write a PNG sequence instead.')
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def write(self, image):
+        """
+        Queues a PIL image to be encoded, without blocking.
+        :return: Whether the image was queued.
+        """
+        try:
+            self._queue.put_nowait(image)
+            return True
+        except queue.Full:
+            self.dropped_frames += 1
+            return False
+
+    def _open_encoder(self, size):
+        # Raw RGB frames are piped into ffmpeg, the stream's size is fixed by the first frame
+        return subprocess.Popen([
+            'ffmpeg', '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{size[0]}x{size[1]}', '-r', str(self.fps), '-i', '-',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p', self.path
+        ], stdin=subprocess.PIPE)
+
+    def _write_frame(self, image):
+        if self.downsample > 1:
+            image = image.reduce(self.downsample)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        if os.path.splitext(self.path)[1].lower() != '.mp4':
+            image.save(os.path.join(self.path, f'frame_{self.written_frames:06d}.png'), compress_level=1)
+            return
+        if self._encoder is None:
+            self._encoder = self._open_encoder(image.size)
+            self._size = image.size
+        if image.size != self._size:
+            image = image.resize(self._size)
+        self._encoder.stdin.write(image.tobytes())
+
+    def _encode(self):
+        failed = False
+        while True:
+            image = self._queue.get()
+            if image is None:
+                break
+            # After a failure frames are still taken off the queue, so write() and close() never block on it
+            if failed:
+                self.dropped_frames += 1
+                continue
+            try:
+                self._write_frame(image)
+                self.written_frames += 1
+            except (OSError, ValueError):
+                logging.exception(f'Failed to write frame {self.written_frames} to {self.path}, discarding the rest.')
+                self.dropped_frames += 1
+                failed = True
+        if self._encoder is not None:
+            try:
+                self._encoder.stdin.close()
+            except OSError:
+                pass
+            self._encoder.wait()
+
+    def close(self, timeout=10):
+        """
+        Finishes encoding every queued frame and closes the output.
+        :param timeout: Most seconds to wait for the encoder to finish.
+        """
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                logging.error(f'Encoder for {self.path} is not taking frames, abandoning it.')
+            self._thread.join(timeout)
+        logging.info(f'Wrote {self.written_frames} frames to {self.path}, dropped {self.dropped_frames}.')
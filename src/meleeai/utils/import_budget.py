@@ -0,0 +1,72 @@
+"""
+    Guards Alfred's startup time, which counts against every match as Alfred is restarted per match. Each module is
+    imported in a fresh interpreter under -X importtime, failing when it takes longer than its budget or pulls in a
+    dependency that only a mode which was not requested should need.
+
+        python -m meleeai.utils.import_budget
+"""
+
+import argparse
+import logging
+import subprocess
+import sys
+
+# Modules only needed by the interactive display, training, or plotting.
+DEFERRED = ('tkinter', 'PIL.ImageTk', 'matplotlib', 'hmmlearn', 'sklearn')
+
+# Module, cumulative import budget in milliseconds, and modules it must not import.
+BUDGETS = (
+    ('meleeai.alfred', 60, DEFERRED + ('meleeai.framework.engine', 'numpy', 'yaml', 'PIL')),
+    ('meleeai.framework.engine', 400, DEFERRED + ('PIL', 'meleeai.framework.display', 'meleeai.framework.overlay')),
+    ('meleeai.framework.display', 500, DEFERRED)
+)
+
+def import_times(module, python=sys.executable):
+    """
+    Imports a module in a fresh interpreter.
+    :return: Dictionary of every module imported to its cumulative import time in microseconds.
+    """
+    result = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'], stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", the package indented by its depth
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|', 2)
+        times[name.strip()] = int(cumulative)
+    return times
+
+def check(module, budget, forbidden, repeat=3):
+    """
+    :param module: Module to import.
+    :param budget: Most milliseconds the import may take, the best of repeat runs being taken to reduce noise.
+    :param forbidden: Modules that must not be imported along with it.
+    :return: List of violations, empty when within budget.
+    """
+    runs = [import_times(module) for _ in range(repeat)]
+    elapsed = min(times.get(module, 0) for times in runs) / 1000
+    violations = []
+    if elapsed > budget:
+        violations.append(f'{module} took {elapsed:.1f}ms to import, over its {budget}ms budget.')
+    for name in forbidden:
+        if name in runs[0]:
+            violations.append(f'{module} imports {name}.')
+    logging.info(f'{module}: {elapsed:.1f}ms of {budget}ms.')
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser(description='Checks Alfred\'s modules import within their time budgets.')
+    parser.add_argument('-s', '--scale', default=1., action='store', type=float, help='Factor applied to every budget, for slower machines.')
+    parser.add_argument('-r', '--repeat', default=3, action='store', type=int, help='Imports timed per module, the fastest is compared.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    violations = []
+    for module, budget, forbidden in BUDGETS:
+        violations += check(module, budget * args.scale, forbidden, repeat=args.repeat)
+    for violation in violations:
+        logging.error(violation)
+    sys.exit(1 if violations else 0)
+
+if __name__ == '__main__':
+    main()
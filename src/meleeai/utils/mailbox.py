@@ -0,0 +1,113 @@
+import multiprocessing
+import threading
+import time
+
+class Mailbox:
+
+    def __init__(self):
+        """
+        Single-slot mailbox between threads where the latest message wins. Posting over a message that was never
+        taken drops it, so a reader always gets the freshest message and never falls behind.
+        """
+        self.delivered          = 0
+        self.dropped            = 0
+        self.total_age          = 0
+        self.max_age            = 0
+
+        self._condition = threading.Condition()
+        self._message = None
+        self._posted = None
+
+    def put(self, message):
+        """
+        Posts a message, replacing any message still waiting.
+        :param message: Message to post, must not be None.
+        """
+        with self._condition:
+            if self._message is not None:
+                self.dropped += 1
+            self._message = message
+            self._posted = time.monotonic_ns()
+            self._condition.notify_all()
+
+    def take(self, timeout=0):
+        """
+        Takes the waiting message.
+        :param timeout: Seconds to wait for a message, 0 to not wait at all and None to wait indefinitely.
+        :return: The message, or None if there was none.
+        """
+        with self._condition:
+            if self._message is None and timeout != 0:
+                self._condition.wait_for(lambda: self._message is not None, timeout)
+            if self._message is None:
+                return None
+            age = time.monotonic_ns() - self._posted
+            self.delivered += 1
+            self.total_age += age
+            self.max_age = max(self.max_age, age)
+            message, self._message = self._message, None
+            return message
+
+    def stats(self):
+        """
+        Gets delivery statistics, ages are the nanoseconds a message waited between being posted and taken.
+        """
+        with self._condition:
+            return {
+                'delivered' : self.delivered,
+                'dropped' : self.dropped,
+                'mean_age' : self.total_age // self.delivered if self.delivered else 0,
+                'max_age' : self.max_age
+            }
+
+class SharedMailbox:
+
+    # Layout of the shared state
+    FULL, VALUE, TIMESTAMP, POSTED, DELIVERED, DROPPED, TOTAL_AGE, MAX_AGE = range(8)
+
+    def __init__(self, context=multiprocessing):
+        """
+        Single-slot mailbox between processes where the latest message wins, for integer messages such as a
+        FrameRing sequence number along with its timestamp. Shares the same semantics and statistics as Mailbox.
+        :param context: Multiprocessing context the reading process is started from.
+        """
+        self._state = context.Array('q', 8)
+        self._condition = context.Condition(self._state.get_lock())
+
+    def put(self, value, timestamp=0):
+        with self._condition:
+            if self._state[self.FULL]:
+                self._state[self.DROPPED] += 1
+            self._state[self.FULL] = 1
+            self._state[self.VALUE] = value
+            self._state[self.TIMESTAMP] = timestamp
+            self._state[self.POSTED] = time.monotonic_ns()
+            self._condition.notify_all()
+
+    def take(self, timeout=0):
+        """
+        Takes the waiting message.
+        :param timeout: Seconds to wait for a message, 0 to not wait at all and None to wait indefinitely.
+        :return: (value, timestamp), or None if there was none.
+        """
+        with self._condition:
+            if not self._state[self.FULL] and timeout != 0:
+                self._condition.wait_for(lambda: self._state[self.FULL], timeout)
+            if not self._state[self.FULL]:
+                return None
+            age = time.monotonic_ns() - self._state[self.POSTED]
+            self._state[self.DELIVERED] += 1
+            self._state[self.TOTAL_AGE] += age
+            self._state[self.MAX_AGE] = max(self._state[self.MAX_AGE], age)
+            self._state[self.FULL] = 0
+            return self._state[self.VALUE], self._state[self.TIMESTAMP]
+
+    def stats(self):
+        with self._condition:
+            delivered = self._state[self.DELIVERED]
+            return {
+                'delivered' : delivered,
+                'dropped' : self._state[self.DROPPED],
+                'mean_age' : self._state[self.TOTAL_AGE] // delivered if delivered else 0,
+                'max_age' : self._state[self.MAX_AGE]
+            }
@@ -4,4 +4,10 @@ class MessageType(Enum):
 
     CONTROLLER = 0,
     SLIPPI = 1,
-    VIDEO = 2
\ No newline at end of file
+    VIDEO = 2
+
+class CommandType(Enum):
+
+    UPDATE = 0,
+    SHUTDOWN = 1,
+    OVERLAY = 2
\ No newline at end of file
@@ -0,0 +1,78 @@
+import logging
+import queue
+import threading
+
+from meleeai.utils.thread_runner import ThreadRunner
+
+class PipeWriter(ThreadRunner):
+
+    def __init__(self, connection, MAX_SIZE=4096, TIMEOUT=1.):
+        """
+        Writes messages to a multiprocessing Connection from its own thread, so posting never blocks on a full pipe.
+        Messages posted while MAX_SIZE are already waiting, or after the pipe broke, are dropped and counted.
+        :param connection: Connection the messages are sent over, closed by the writer once it has stopped.
+        :param MAX_SIZE: Messages waiting to be sent at once.
+        :param TIMEOUT: Most seconds stop() waits for a send blocked on a pipe nobody reads.
+        """
+        self.TIMEOUT            = TIMEOUT
+
+        self.sent_messages      = 0
+        self.dropped_messages   = 0
+
+        self._connection = connection
+        self._queue = queue.Queue(maxsize=MAX_SIZE)
+        self._broken = False
+        self._stopping = False
+        self._thread = None
+
+    def put(self, message):
+        """
+        Queues a message to be sent, without blocking.
+        :return: Whether the message was queued.
+        """
+        if self._broken:
+            self.dropped_messages += 1
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.dropped_messages += 1
+            return False
+
+    def _write(self):
+        while True:
+            try:
+                message = self._queue.get(timeout=.1)
+            except queue.Empty:
+                if self._stopping:
+                    break
+                continue
+            # Once stopping nobody reads the pipe any more, so what is still queued is discarded
+            if self._broken or self._stopping:
+                self.dropped_messages += 1
+                continue
+            try:
+                self._connection.send(message)
+                self.sent_messages += 1
+            except OSError as error:
+                # The reading end was closed, everything from here on is discarded
+                logging.warning(f'Pipe closed, dropping further messages: {error}')
+                self._broken = True
+                self.dropped_messages += 1
+        # Closed only here, as closing it mid-send would leave the reader a partial message
+        self._connection.close()
+
+    def run(self):
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            self._connection.close()
+            return
+        self._stopping = True
+        self._thread.join(self.TIMEOUT)
+        if self._thread.is_alive():
+            logging.warning('Pipe writer is blocked on a pipe nobody reads, it stops once the pipe is read or closed.')
+        logging.info(f'Sent {self.sent_messages} messages through the pipe, dropped {self.dropped_messages}.')
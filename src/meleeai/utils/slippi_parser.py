@@ -0,0 +1,81 @@
+import heapq
+import logging
+import struct
+
+from slippi.event import ParseEvent
+from slippi.live import Parser
+
+from meleeai.utils import clock
+from meleeai.utils.message_type import MessageType
+
+class SlippiParser:
+
+    def __init__(self, WINDOW_SIZE=8):
+        """
+        Reassembles a Slippi event stream sent over UDP and decodes it into frames.
+        Each datagram carries a sequence number followed by whole Slippi events, sequence 0 starting
+        a new game with the replay header.
+        :param WINDOW_SIZE: Datagrams held back waiting for a missing one before it is considered lost.
+        """
+        self.HEADER             = '>I'
+        self.HEADER_SIZE        = struct.calcsize(self.HEADER)
+        self.HEADER_UNPACK      = struct.Struct(self.HEADER).unpack_from
+        self.WINDOW_SIZE        = WINDOW_SIZE
+
+        self.lost_datagrams     = 0
+        self.dropped_frames     = 0
+
+        self._frames = []
+        self.clear()
+
+    def _on_frame(self, frame):
+        # Rollback can resend frames that were already delivered, only ever move forward.
+        if self._last_index is not None and frame.index <= self._last_index:
+            self.dropped_frames += 1
+            return
+        self._last_index = frame.index
+        self._frames.append((clock.now(), (MessageType.SLIPPI, frame)))
+
+    def _feed(self, data):
+        try:
+            self._parser.feed(data)
+        except Exception:
+            logging.exception('Failed to parse Slippi stream, waiting for the next game.')
+            self._parser = Parser({})
+
+    def clear(self):
+        self._pending = []
+        self._sequence = 0
+        self._last_index = None
+        self._parser = Parser({ParseEvent.FRAME: self._on_frame})
+
+    def get_frames(self):
+        """
+        Gets all frames decoded since the last call, in frame order.
+        """
+        frames, self._frames = self._frames, []
+        return frames
+
+    def update(self, data_str):
+        if len(data_str) < self.HEADER_SIZE:
+            logging.error('Data string provided is too small for header to parse.')
+            return False
+        (sequence,) = self.HEADER_UNPACK(data_str)
+
+        if sequence == 0:
+            self.clear()
+        elif sequence < self._sequence:
+            logging.warning(f'Discarding late Slippi datagram {sequence}.')
+            return False
+        heapq.heappush(self._pending, (sequence, bytes(data_str[self.HEADER_SIZE:])))
+
+        # Feed datagrams in sequence order, giving up on a missing one once the window fills up
+        while self._pending and (self._pending[0][0] == self._sequence or len(self._pending) > self.WINDOW_SIZE):
+            sequence, data = heapq.heappop(self._pending)
+            if sequence != self._sequence:
+                logging.warning(f'Lost Slippi datagrams {self._sequence} to {sequence - 1}.')
+                self.lost_datagrams += sequence - self._sequence
+            self._sequence = sequence + 1
+            self._feed(data)
+
+        return bool(self._frames)
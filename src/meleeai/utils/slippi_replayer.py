@@ -0,0 +1,35 @@
+"""
+    Stand-in for a live Slippi stream. Sends a recorded replay to Alfred's slippi port one frame
+    per datagram at 60 fps, in the format understood by SlippiParser.
+"""
+
+import argparse
+import socket
+import struct
+import time
+
+from slippi.live import chunks
+
+def replay(path, port, host='localhost', fps=60):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        next_frame = time.monotonic()
+        for sequence, chunk in enumerate(chunks(path)):
+            sock.sendto(struct.pack('>I', sequence) + chunk, (host, port))
+            next_frame += 1 / fps
+            time.sleep(max(next_frame - time.monotonic(), 0))
+    finally:
+        sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Replays a Slippi replay file over UDP as if it were a live game.')
+    parser.add_argument('replay', type=str, help='Slippi replay (.slp) to send.')
+    parser.add_argument('-p', '--port', default=55080, type=int, help='Port to send to, Alfred\'s configured slippi port.')
+    parser.add_argument('--host', default='localhost', type=str, help='Host to send to.')
+    parser.add_argument('--fps', default=60, type=float, help='Frames sent per second.')
+    args = parser.parse_args()
+
+    replay(args.replay, args.port, host=args.host, fps=args.fps)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+import logging
+import socket
+
+# Large enough to absorb a few frames of video at a bitrate spike.
+RECEIVE_BUFFER_SIZE = 2**23
+
+def set_receive_buffer(sock, size=RECEIVE_BUFFER_SIZE):
+    """
+    Enlarges the kernel receive buffer of a socket.
+    :param sock: Socket to configure.
+    :param size: Requested size in bytes, the kernel may cap it (net.core.rmem_max on Linux).
+    :return: Size actually granted.
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+    except OSError:
+        logging.exception(f'Failed to set receive buffer size to {size}.')
+    granted = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    if granted < size:
+        logging.warning(f'Receive buffer of port {sock.getsockname()[1]} capped at {granted} bytes, {size} requested.')
+    return granted
+
+def kernel_drops(sock):
+    """
+    Gets the number of datagrams the kernel dropped for a bound UDP socket because its receive buffer was full.
+    :param sock: Bound UDP socket.
+    :return: Dropped datagram count, or None where the platform doesn't expose it.
+    """
+    port = sock.getsockname()[1]
+    path = '/proc/net/udp6' if sock.family == socket.AF_INET6 else '/proc/net/udp'
+    try:
+        with open(path, 'r') as stream:
+            next(stream)
+            for line in stream:
+                fields = line.split()
+                # local_address is HEX_IP:HEX_PORT, drops is the last column
+                if int(fields[1].rsplit(':', 1)[1], 16) == port:
+                    return int(fields[-1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
@@ -1,92 +1,142 @@
-import array
+import collections
+import heapq
 import logging
 import struct
-import sys
-
-from io import BytesIO
 
+from meleeai.utils import clock
 from meleeai.utils.message_type import MessageType
 
 class VideoParser:
 
-    def __init__(self, MAX_SIZE=10):
+    def __init__(self, MAX_SIZE=10, MAX_AGE=.1):
+        """
+        Reassembles segmented video frames. Partial frames are held until every segment has arrived, completed
+        frames wait in a queue ordered by capture time until they are collected. Frames are stamped with the
+        arrival of their first segment on Alfred's clock, as every stream is, the sender's capture time only
+        orders them.
+        :param MAX_SIZE: Partial frames held at once before the oldest is given up on.
+        :param MAX_AGE: Seconds a partial frame is held waiting for its missing segments.
+        """
         self.HEADER             = '>I B B 2i 4I'
         self.HEADER_SIZE        = struct.calcsize(self.HEADER)
-        self.HEADER_UNPACK      = struct.Struct(self.HEADER).unpack
+        self.HEADER_UNPACK      = struct.Struct(self.HEADER).unpack_from
         self.MAP_SIZE           = MAX_SIZE
+        self.MAX_AGE            = clock.from_seconds(MAX_AGE)
+
+        self.evicted_frames     = 0
+
+        # Partial frames in order of their first segment's arrival, so the stalest is always first.
+        self._video_data = collections.OrderedDict()
+        self._ready = []
+        # Recently completed frames, so a late duplicate segment cannot start the frame over.
+        self._completed = collections.OrderedDict()
 
-        self._video_data = {}
-
-    def _concat_image(self, frame_segments):
-        raw = None
-        total_bs = 0
-        for data in frame_segments:
-            if not raw:
-                raw = data['raw']
-            else:
-                raw += data['raw']
-            total_bs += data['block_size']
-        return array.array('B', raw), total_bs
-
-    # TODO: Remove abs() if its desired that left-hand side is more favorable than right-hand side.
-    def _get_completed_image(self, timestamp=0):
+    def _place_segment(self, frame_data, segment, payload):
         """
-        Gets the image closest to the provided timestamp.
-        :param timestamp: Timestamp of frames. Keep relative to data rather than system as Windows Dolphin
-                          time is currently bugged.
-        :return: frame, timestamp, min_tim
+        Copies a segment's payload straight into the frame's buffer. Every segment but the last is
+        block_size long, so that size is the stride between segments; a last segment arriving before
+        the stride is known is held until it is.
         """
-        closest_frame, closest_time, time_difference = None, None, sys.maxsize
-        for frame, list_data in self._video_data.items():
-            for data in list_data:
-                if (data['index'] + 1) == data['total_segments']:
-                    if not closest_frame or abs(timestamp - data['timestamp']) < time_difference:
-                        closest_frame, closest_time, time_difference = frame, data['timestamp'], abs(timestamp - data['timestamp'])
-        return closest_frame, closest_time, time_difference
+        if frame_data['buffer'] is None:
+            frame_data['buffer'] = bytearray(frame_data['stride'] * frame_data['total_segments'])
+        offset = segment * frame_data['stride']
+        frame_data['buffer'][offset:offset + len(payload)] = payload
+        if segment + 1 == frame_data['total_segments']:
+            frame_data['size'] = offset + len(payload)
+
+    def _evict(self, now):
+        while self._video_data:
+            frame, frame_data = next(iter(self._video_data.items()))
+            if len(self._video_data) <= self.MAP_SIZE and now - frame_data['timestamp'] <= self.MAX_AGE:
+                break
+            self._video_data.popitem(last=False)
+            self.evicted_frames += 1
+            logging.debug(f'Evicted incomplete video frame {frame}, {frame_data["remaining"]} segments missing.')
 
     def clear(self):
         self._video_data.clear()
+        self._ready.clear()
+        self._completed.clear()
 
     def get_completed_images(self):
         """
-        Gets all the
+        Gets all the completed images in capture order, each as a bytearray holding the whole encoded image.
         """
         completed_images = []
-        while self._video_data:
-            frame, timestamp, _ = self._get_completed_image()
-            if frame:
-                completed_images.append((timestamp, (MessageType.VIDEO, self._concat_image(self._video_data[frame])[0])))
-                self._video_data.pop(frame)
-            else:
-                break
+        while self._ready:
+            _, _, timestamp, image = heapq.heappop(self._ready)
+            completed_images.append((timestamp, (MessageType.VIDEO, image)))
         return completed_images
 
     def update(self, data_str):
+        """
+        Adds a datagram's segment to its frame.
+        :param data_str: Bytes-like object holding the datagram, typically a memoryview of a reused receive buffer.
+                         The segment is copied out of it before returning.
+        :return: Whether the segment completed its frame.
+        """
         # Parse the message
-        ret = True
         if len(data_str) < self.HEADER_SIZE:
             logging.error('Data string provided is too small for header to parse.')
-            ret = False
-        (frame, segment, total_segments, width, height, block_size, _, seconds, microseconds)= self.HEADER_UNPACK(data_str[:30])
-        if block_size > len(data_str[30:]):
+            return False
+        (frame, segment, total_segments, width, height, block_size, _, seconds, microseconds) = self.HEADER_UNPACK(data_str)
+        if block_size > len(data_str) - self.HEADER_SIZE:
             logging.error('Data string provided is too small for image to be parsed.')
-            ret = False
+            return False
+        if segment >= total_segments:
+            logging.error(f'Segment {segment} is out of range for a frame of {total_segments} segments.')
+            return False
+        payload = data_str[self.HEADER_SIZE:self.HEADER_SIZE + block_size]
+
+        if frame in self._completed:
+            return False
+        now = clock.now()
+        self._evict(now)
 
-        # Take parsed message and place into dict
+        # Take parsed message and place into the frame's buffer
         if frame not in self._video_data:
-            self._video_data[frame] = []
-        self._video_data[frame].append({
-            'index' : segment,
-            'total_segments' : total_segments,
-            'block_size' : block_size,
-            'width' : width,
-            'height' : height,
-            'timestamp' : int(f'{seconds}{microseconds}'),
-            'raw' : list(struct.unpack('>' + 'B' * block_size, data_str[30:])) # big endian? 
-        })
-
-        # Take dictionary, if threshold is met, delete oldest key
-        if len(list(self._video_data.keys())) > self.MAP_SIZE:
-            self._video_data.pop(min(list(self._video_data.keys())))
-
-        return ret
\ No newline at end of file
+            self._video_data[frame] = {
+                'total_segments' : total_segments,
+                'width' : width,
+                'height' : height,
+                'capture_time' : clock.from_timeval(seconds, microseconds),
+                'timestamp' : now,
+                'received' : 0,
+                'remaining' : total_segments,
+                'stride' : None,
+                'buffer' : None,
+                'size' : None,
+                'last_segment' : None
+            }
+        frame_data = self._video_data[frame]
+
+        # Bitmap of the segments placed so far, a duplicated datagram must not count twice.
+        bit = 1 << segment
+        if frame_data['received'] & bit:
+            return False
+        frame_data['received'] |= bit
+        frame_data['remaining'] -= 1
+
+        is_last = segment + 1 == total_segments
+        if frame_data['stride'] is None and (not is_last or total_segments == 1):
+            frame_data['stride'] = block_size
+        if frame_data['stride'] is None:
+            frame_data['last_segment'] = bytes(payload)
+        else:
+            self._place_segment(frame_data, segment, payload)
+            if frame_data['last_segment'] is not None:
+                self._place_segment(frame_data, total_segments - 1, frame_data['last_segment'])
+                frame_data['last_segment'] = None
+
+        if frame_data['remaining']:
+            return False
+
+        # The frame number breaks capture time ties so images are never compared.
+        self._video_data.pop(frame)
+        self._completed[frame] = None
+        if len(self._completed) > self.MAP_SIZE:
+            self._completed.popitem(last=False)
+        image = frame_data['buffer']
+        del image[frame_data['size']:]
+        heapq.heappush(self._ready, (frame_data['capture_time'], frame, frame_data['timestamp'], image))
+        return True
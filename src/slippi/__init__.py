@@ -1,2 +1,2 @@
 from slippi.game import Game
-from slippi.parse import parse
+from slippi.parse import parse, peek_metadata, peek_start
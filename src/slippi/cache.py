@@ -0,0 +1,133 @@
+import hashlib, json, os, tempfile, zipfile
+
+import numpy as np
+
+from slippi.columnar import Frames
+from slippi.event import Start, End
+from slippi.id import CSSCharacter, Stage
+from slippi.metadata import Metadata
+from slippi.parse import PARSER_VERSION
+from slippi.util import *
+
+
+def _start_json(start):
+    def player(p):
+        return p and [int(p.character), int(p.type), p.stocks, p.costume, None if p.team is None else int(p.team), int(p.ucf.dash_back), int(p.ucf.shield_drop), p.tag]
+    v = start.slippi.version
+    return [start.is_teams, [player(p) for p in start.players], start.random_seed, [v.major, v.minor, v.revision], int(start.stage), start.is_pal, start.is_frozen_ps]
+
+
+def _start_from_json(json):
+    def player(p):
+        if p is None:
+            return None
+        (character, type, stocks, costume, team, dash_back, shield_drop, tag) = p
+        ucf = Start.Player.UCF(Start.Player.UCF.DashBack(dash_back), Start.Player.UCF.ShieldDrop(shield_drop))
+        return Start.Player(CSSCharacter(character), Start.Player.Type(type), stocks, costume, None if team is None else Start.Player.Team(team), ucf, tag)
+    (is_teams, players, random_seed, version, stage, is_pal, is_frozen_ps) = json
+    return Start(is_teams, tuple(player(p) for p in players), random_seed, Start.Slippi(Start.Slippi.Version(*version)), Stage(stage), is_pal, is_frozen_ps)
+
+
+class Cache(Base):
+    """On-disk cache of parsed replays, for use with :py:class:`slippi.game.Game`'s `cache` argument.
+
+    Entries are keyed by the hash of the replay's contents plus :py:data:`slippi.parse.PARSER_VERSION`, so renamed or copied replays still hit and parser changes invalidate old entries. Each entry is an uncompressed `.npz` of plain arrays: the columnar frame arrays, plus the start, end & raw metadata encoded as JSON. Nothing is unpickled, so loading entries from a shared directory can't run code. Once the directory grows beyond `max_size` bytes, the least recently used entries are evicted."""
+
+    __slots__ = 'directory', 'max_size', '_size'
+
+    SUFFIX = '.npz'
+    FORMAT = 2 # bump whenever the layout of entries changes
+
+    def __init__(self, directory, max_size = 2**32):
+        self.directory = directory #: str: Directory holding cache entries
+        self.max_size = max_size #: int: Total size (in bytes) that entries may use before eviction
+        # Running total of entry sizes, so that storing only scans the directory once it's over `max_size`. Entries stored by other processes are only counted by the next scan.
+        self._size = None
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path):
+        """Returns the cache key for the replay at `path`."""
+
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                digest.update(chunk)
+        return '%s-%d-%d' % (digest.hexdigest(), PARSER_VERSION, self.FORMAT)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def load(self, key, game):
+        """Fills in `game` from the entry for `key`. Returns False on a cache miss."""
+
+        path = self._path(key)
+        try:
+            with np.load(path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+            (start, end, metadata_raw) = json.loads(arrays.pop('game').tobytes())
+            fields = (start and _start_from_json(start), end and End(End.Method(end[0]), end[1]), Metadata._parse(metadata_raw), metadata_raw)
+            frames = Frames._from_arrays(arrays)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, TypeError, EOFError, KeyError, zipfile.BadZipFile) as e: # truncated or corrupted, e.g. by a crash mid-write
+            warn('discarding corrupt cache entry %s: %s: %s' % (path, e.__class__.__name__, e))
+            try: os.unlink(path)
+            except OSError: pass
+            return False
+
+        (game.start, game.end, game.metadata, game.metadata_raw) = fields
+        game.frames = frames
+
+        # mtime doubles as last-access time for eviction
+        try: os.utime(path)
+        except OSError: pass
+        return True
+
+    def store(self, key, game):
+        """Writes `game` (which must have columnar frames) to the entry for `key`, then evicts old entries as needed."""
+
+        arrays = game.frames._arrays()
+        # Metadata is parsed again from the raw JSON when loading
+        fields = (game.start and _start_json(game.start), game.end and [int(game.end.method), game.end.lras_initiator], game.metadata_raw)
+        arrays['game'] = np.frombuffer(json.dumps(fields).encode(), dtype=np.uint8)
+
+        # Written under a temporary name so that concurrent readers never see a partial entry
+        (fd, tmp_path) = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+                size = f.tell()
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        if self._size is None:
+            self.evict()
+        else:
+            self._size += size
+            if self._size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits within `max_size`, scanning the whole directory."""
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError: # evicted concurrently
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, path) in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
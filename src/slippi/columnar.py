@@ -0,0 +1,266 @@
+import numpy as np
+
+from slippi.event import EventType, StateFlags
+from slippi.util import *
+
+
+# Wire layout of pre-frame & post-frame payloads, as (field, numpy type) pairs in the order they appear. Trailing fields were added by later Slippi versions, so only the fields that fit within a replay's declared payload size are decoded; the rest are None.
+PRE_FIELDS = (
+    ('frame', '>i4'),
+    ('port', 'u1'),
+    ('is_follower', '?'),
+    ('random_seed', '>u4'),
+    ('state', '>u2'),
+    ('position_x', '>f4'),
+    ('position_y', '>f4'),
+    ('direction', '>f4'),
+    ('joystick_x', '>f4'),
+    ('joystick_y', '>f4'),
+    ('cstick_x', '>f4'),
+    ('cstick_y', '>f4'),
+    ('triggers_logical', '>f4'),
+    ('buttons_logical', '>u4'),
+    ('buttons_physical', '>u2'),
+    ('triggers_physical_l', '>f4'),
+    ('triggers_physical_r', '>f4'),
+    ('raw_analog_x', 'u1'), # v1.2.0
+    ('damage', '>f4')) # v1.4.0
+
+POST_FIELDS = (
+    ('frame', '>i4'),
+    ('port', 'u1'),
+    ('is_follower', '?'),
+    ('character', 'u1'),
+    ('state', '>u2'),
+    ('position_x', '>f4'),
+    ('position_y', '>f4'),
+    ('direction', '>f4'),
+    ('damage', '>f4'),
+    ('shield', '>f4'),
+    ('last_attack_landed', 'u1'),
+    ('combo_count', 'u1'),
+    ('last_hit_by', 'u1'),
+    ('stocks', 'u1'),
+    ('state_age', '>f4'), # v0.2.0
+    ('flags', '5u1'), # v2.0.0
+    ('misc_as', '>f4'), # v2.0.0
+    ('airborne', '?'), # v2.0.0
+    ('ground', '>u2'), # v2.0.0
+    ('jumps', 'u1'), # v2.0.0
+    ('l_cancel', 'u1')) # v2.0.0
+
+
+def record_dtype(fields, size):
+    """Returns a structured dtype for a payload of `size` bytes, containing every field of `fields` that fits."""
+
+    names, formats, offsets = [], [], []
+    offset = 0
+    for (name, fmt) in fields:
+        dtype = np.dtype(fmt)
+        if offset + dtype.itemsize > size:
+            break
+        names.append(name)
+        formats.append(dtype)
+        offsets.append(offset)
+        offset += dtype.itemsize
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': size})
+
+
+def _fill_value(dtype):
+    return np.nan if dtype.kind == 'f' else 0
+
+
+class _Columns(Base):
+    __slots__ = []
+
+    def __init__(self, columns):
+        for attr in self.__slots__:
+            setattr(self, attr, columns.get(attr))
+
+    def _attr_repr(self, attr):
+        value = getattr(self, attr)
+        if value is None:
+            return attr + '=None'
+        return '%s=array(%s)[%d]' % (attr, value.dtype, len(value))
+
+
+class Frames(Base):
+    """Columnar frame data for a whole game. Every field is a single NumPy array per port, with one row per frame."""
+
+    __slots__ = 'index', 'ports'
+
+    def __init__(self, index, ports):
+        self.index = index #: numpy.ndarray(int32): Frame number of each row
+        self.ports = ports #: tuple(:py:class:`Port` | None): Frame data for each port (port 1 is at index 0; empty ports will contain None)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _attr_repr(self, attr):
+        if attr == 'index':
+            return 'index=array(int32)[%d]' % len(self.index)
+        return super()._attr_repr(attr)
+
+    def _arrays(self):
+        """Flattens these frames into a dict of named arrays (e.g. for `numpy.savez`)."""
+
+        arrays = {'index': self.index}
+        for (i, port) in enumerate(self.ports):
+            for character in ('leader', 'follower'):
+                data = port and getattr(port, character)
+                if data:
+                    prefix = '%d.%s.' % (i, character)
+                    arrays[prefix + 'present'] = data.present
+                    for (kind, columns) in (('pre', data.pre), ('post', data.post)):
+                        for attr in columns.__slots__:
+                            value = getattr(columns, attr)
+                            if value is not None:
+                                arrays[prefix + kind + '.' + attr] = value
+        return arrays
+
+    @classmethod
+    def _from_arrays(cls, arrays):
+        """Inverse of :py:meth:`_arrays`."""
+
+        ports = []
+        for i in PORTS:
+            characters = []
+            for character in ('leader', 'follower'):
+                prefix = '%d.%s.' % (i, character)
+                if prefix + 'present' not in arrays:
+                    characters.append(None)
+                    continue
+                columns = {}
+                for kind in ('pre', 'post'):
+                    columns[kind] = {attr[len(prefix + kind) + 1:]: arrays[attr] for attr in arrays if attr.startswith(prefix + kind + '.')}
+                characters.append(cls.Port.Data(arrays[prefix + 'present'], cls.Port.Data.Pre(columns['pre']), cls.Port.Data.Post(columns['post'])))
+            ports.append(cls.Port(*characters) if characters[0] else None)
+        return cls(arrays['index'], tuple(ports))
+
+
+    class Port(Base):
+        """Frame data for a given port. Can include two characters' frame data (ICs)."""
+
+        __slots__ = 'leader', 'follower'
+
+        def __init__(self, leader, follower = None):
+            self.leader = leader #: :py:class:`Data`: Frame data for the controlled character
+            self.follower = follower #: :py:class:`Data` | None: Frame data for the follower (Nana), if any
+
+
+        class Data(Base):
+            """Frame data for a given character. Rows where the character has no data (e.g. a dead Nana) are zero, or NaN for floats."""
+
+            __slots__ = 'present', 'pre', 'post'
+
+            def __init__(self, present, pre, post):
+                self.present = present #: numpy.ndarray(bool): True for rows where this character has frame data
+                self.pre = pre #: :py:class:`Pre`: Pre-frame update data
+                self.post = post #: :py:class:`Post`: Post-frame update data
+
+
+            class Pre(_Columns):
+                """Pre-frame update data. See :py:class:`slippi.event.Frame.Port.Data.Pre` for the meaning of each field."""
+
+                __slots__ = 'state', 'position_x', 'position_y', 'direction', 'joystick_x', 'joystick_y', 'cstick_x', 'cstick_y', 'triggers_logical', 'triggers_physical_l', 'triggers_physical_r', 'buttons_logical', 'buttons_physical', 'random_seed', 'raw_analog_x', 'damage'
+
+
+            class Post(_Columns):
+                """Post-frame update data. See :py:class:`slippi.event.Frame.Port.Data.Post` for the meaning of each field. `flags` holds the raw :py:class:`slippi.event.StateFlags` bits, and `hit_stun` is NaN outside of hitstun."""
+
+                __slots__ = 'character', 'state', 'state_age', 'position_x', 'position_y', 'direction', 'damage', 'shield', 'stocks', 'last_attack_landed', 'last_hit_by', 'combo_count', 'flags', 'hit_stun', 'airborne', 'ground', 'jumps', 'l_cancel'
+
+
+    @classmethod
+    def _parse(cls, buf, codes, offsets, payload_sizes):
+        raw = np.frombuffer(buf, dtype=np.uint8)
+        (frame_codes, frame_offsets, numbers, is_new) = frame_events(raw, codes, offsets)
+        rows = np.cumsum(is_new) - 1
+        count = int(is_new.sum())
+
+        is_pre = frame_codes == EventType.FRAME_PRE
+        pre = _records(raw, frame_offsets[is_pre], payload_sizes[EventType.FRAME_PRE], PRE_FIELDS)
+        pre_rows = rows[is_pre]
+        post = _records(raw, frame_offsets[~is_pre], payload_sizes[EventType.FRAME_POST], POST_FIELDS)
+        post_rows = rows[~is_pre]
+
+        ports = []
+        for port in PORTS:
+            characters = []
+            for is_follower in (False, True):
+                pre_selected = (pre['port'] == port) & (pre['is_follower'] == is_follower)
+                post_selected = (post['port'] == port) & (post['is_follower'] == is_follower)
+                if not (pre_selected.any() or post_selected.any()):
+                    characters.append(None)
+                    continue
+                present = np.zeros(count, dtype=bool)
+                present[pre_rows[pre_selected]] = True
+                present[post_rows[post_selected]] = True
+                characters.append(cls.Port.Data(present,
+                    cls.Port.Data.Pre(_columns(_select(pre, pre_selected), pre_rows[pre_selected], count)),
+                    cls.Port.Data.Post(_post_columns(_select(post, post_selected), post_rows[post_selected], count))))
+            ports.append(cls.Port(*characters) if characters[0] else None)
+
+        return cls(numbers[is_new].astype(np.int32), tuple(ports))
+
+
+def frame_events(raw, codes, offsets):
+    """Picks the pre-frame & post-frame events out of the records found by `slippi.parse._scan_events`.
+
+    Returns their codes, offsets & frame numbers, and a mask of the events that start a new frame. Frames follow the order they appear in, starting anew whenever the frame number changes (as `slippi.parse.parse` does for Frame objects)."""
+
+    codes = np.array(codes, dtype=np.uint8)
+    offsets = np.array(offsets, dtype=np.intp)
+    is_frame = (codes == EventType.FRAME_PRE) | (codes == EventType.FRAME_POST)
+    frame_codes = codes[is_frame]
+    frame_offsets = offsets[is_frame]
+    numbers = _gather(raw, frame_offsets, np.dtype('>i4'))
+    is_new = np.ones(len(numbers), dtype=bool)
+    is_new[1:] = numbers[1:] != numbers[:-1]
+    return (frame_codes, frame_offsets, numbers, is_new)
+
+
+def _gather(raw, offsets, dtype):
+    """Copies the payloads following the command bytes at `offsets` into an array of `dtype`.
+
+    Events aren't evenly spaced, so the buffer is viewed as overlapping raw payloads, one starting at every byte, and those at `offsets` are copied out with a single index per event. Copying them as opaque bytes and only then viewing them as `dtype` is far faster than copying structured records field by field."""
+    payloads = np.ndarray((max(len(raw) - dtype.itemsize, 0),), dtype=np.dtype((np.void, dtype.itemsize)), buffer=raw, offset=1, strides=(1,))
+    return payloads[offsets].view(dtype)
+
+
+def _records(raw, offsets, size, fields):
+    """Decodes the `size`-byte payloads following the command bytes at `offsets` as structured records."""
+    return _gather(raw, offsets, record_dtype(fields, size))
+
+
+def _select(records, mask):
+    """Picks the records where `mask` is True, copying them as opaque bytes rather than field by field."""
+    return records.view(np.dtype((np.void, records.dtype.itemsize)))[mask].view(records.dtype)
+
+
+def _columns(records, rows, count):
+    columns = {}
+    for name in records.dtype.names[3:]:
+        field = records[name]
+        # Byte-swapped in one contiguous pass; rows are increasing, so a character with data on every row needs no scatter
+        column = field.astype(field.dtype.newbyteorder('='))
+        if len(rows) != count:
+            scattered = np.full((count,) + field.shape[1:], _fill_value(field.dtype), dtype=column.dtype)
+            scattered[rows] = column
+            column = scattered
+        columns[name] = column
+    if 'direction' in columns:
+        columns['direction'] = np.nan_to_num(columns['direction']).astype(np.int8)
+    return columns
+
+
+def _post_columns(records, rows, count):
+    columns = _columns(records, rows, count)
+    flags = columns.pop('flags', None)
+    if flags is not None:
+        flags = flags.astype(np.uint64)
+        columns['flags'] = sum(flags[:, i] << np.uint64(8 * i) for i in range(5))
+    misc_as = columns.pop('misc_as', None)
+    if misc_as is not None and flags is not None:
+        columns['hit_stun'] = np.where(columns['flags'] & np.uint64(StateFlags.HIT_STUN), misc_as, np.float32(np.nan))
+    return columns
@@ -0,0 +1,107 @@
+import collections, concurrent.futures, itertools, os
+from concurrent.futures.process import BrokenProcessPool
+
+from slippi.game import Game
+from slippi.util import *
+
+
+class Result(Base):
+    """Outcome of loading a single replay from a corpus."""
+
+    __slots__ = 'path', 'game', 'error'
+
+    def __init__(self, path, game = None, error = None):
+        self.path = path #: str: Path of the replay
+        self.game = game #: :py:class:`slippi.game.Game` | None: Parsed game, unless parsing failed
+        self.error = error #: str | None: Description of the parsing failure, if any
+
+
+def _load(path, kwargs):
+    try:
+        return Result(path, game=Game(path, **kwargs))
+    except Exception as e:
+        return Result(path, error='%s: %s' % (e.__class__.__name__, e))
+
+
+def _lost(future):
+    """Whether a replay's result was lost to a worker dying, rather than having finished or being still to submit."""
+
+    if future is None:
+        return True
+    if isinstance(future, Result):
+        return False
+    return future.cancelled() or not future.done() or isinstance(future.exception(), BrokenProcessPool)
+
+
+def _retry(entries, workers, kwargs):
+    """Parses replays lost to a dead worker again, each in a pool of its own so that a replay which kills its worker only fails itself."""
+
+    for i in range(0, len(entries), workers):
+        pools = []
+        try:
+            for entry in entries[i:i + workers]:
+                pools.append(concurrent.futures.ProcessPoolExecutor(1))
+                entry[1] = pools[-1].submit(_load, entry[0], kwargs)
+            for entry in entries[i:i + workers]:
+                try:
+                    entry[1] = entry[1].result()
+                except Exception as e:
+                    entry[1] = Result(entry[0], error='%s: %s' % (e.__class__.__name__, e))
+        finally:
+            for pool in pools:
+                pool.shutdown()
+
+
+def load(paths, workers = None, max_pending = None, **kwargs):
+    """Parses many replays in parallel, yielding a :py:class:`Result` per path in the same order as `paths`.
+
+    Replays are parsed by a pool of `workers` processes (default: one per CPU; 1 parses in this process). At most `max_pending` replays (default: twice the number of workers) are parsed or waiting to be consumed at any time, which bounds memory use regardless of corpus size. Replays that fail to parse are reported through :py:attr:`Result.error` rather than raised. If a worker process dies, replays that already finished are still yielded and the others are retried one to a pool, so only a replay whose own worker dies is reported as failed.
+
+    Any other keyword arguments are passed on to :py:class:`slippi.game.Game`. Games are pickled back from the worker processes, so `columnar=True` is much cheaper for large corpora."""
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max(max_pending or 2 * workers, 1)
+
+    if workers == 1:
+        for path in paths:
+            result = _load(path, kwargs)
+            if result.error:
+                warn('failed to load %s: %s' % (path, result.error))
+            yield result
+        return
+
+    paths = iter(paths)
+    pending = collections.deque() # [path, future or Result]
+    executor = concurrent.futures.ProcessPoolExecutor(workers)
+    try:
+        while True:
+            try:
+                for path in itertools.islice(paths, max_pending - len(pending)):
+                    pending.append([path, None])
+                    pending[-1][1] = executor.submit(_load, path, kwargs)
+                if not pending:
+                    break
+
+                (path, future) = pending[0]
+                try:
+                    result = future if isinstance(future, Result) else future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    result = Result(path, error='%s: %s' % (e.__class__.__name__, e))
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for running out of memory). Replays that already finished keep their results, the others are retried before carrying on with a new pool.
+                executor.shutdown(wait=False)
+                _retry([entry for entry in pending if _lost(entry[1])], workers, kwargs)
+                executor = concurrent.futures.ProcessPoolExecutor(workers)
+                continue
+
+            pending.popleft()
+            if result.error:
+                warn('failed to load %s: %s' % (result.path, result.error))
+            yield result
+    finally:
+        for (_, future) in pending:
+            if isinstance(future, concurrent.futures.Future):
+                future.cancel()
+        executor.shutdown()
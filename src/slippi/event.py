@@ -1,3 +1,5 @@
+import io, struct
+
 from slippi.util import *
 from slippi.id import *
 
@@ -23,6 +25,8 @@ class ParseEvent(Enum):
     METADATA_RAW = 'metadata_raw' #: dict:
     START = 'start' #: :py:class:`Start`:
     FRAME = 'frame' #: :py:class:`Frame`:
+    FRAMES = 'frames' #: :py:class:`slippi.columnar.Frames`:
+    LAZY_FRAMES = 'lazy_frames' #: :py:class:`slippi.lazy.LazyFrames`:
     END = 'end' #: :py:class:`End`:
 
 
@@ -232,6 +236,31 @@ class Frame(Base):
         self.ports = [None, None, None, None]
         """tuple(:py:class:`Port` | None): Frame data for each port (port 1 is at index 0; empty ports will contain None)."""
 
+    # Frame number, port & follower flag, which prefix every pre-frame and post-frame payload.
+    _ID = struct.Struct('>iB?')
+
+    def _add(self, buf, offset, size, is_pre):
+        """Adds a copy of the pre-frame or post-frame payload of `size` bytes at `offset` in `buf`, leaving it undecoded until first accessed. Copying keeps frames from pinning the whole replay in memory."""
+
+        (_, port_index, is_follower) = self._ID.unpack_from(buf, offset)
+        port = self.ports[port_index]
+        if not port:
+            port = self.Port()
+            self.ports[port_index] = port
+
+        if is_follower:
+            if port.follower is None:
+                port.follower = self.Port.Data()
+            data = port.follower
+        else:
+            data = port.leader
+
+        payload = bytes(buf[offset + self._ID.size:offset + size])
+        if is_pre:
+            data._pre = payload
+        else:
+            data._post = payload
+
     def _finalize(self):
         self.ports = tuple(self.ports)
 
@@ -255,18 +284,24 @@ class Frame(Base):
                 self._pre = None
                 self._post = None
 
+            def __getstate__(self):
+                return (self._pre, self._post)
+
+            def __setstate__(self, state):
+                (self._pre, self._post) = state
+
             @property
             def pre(self):
                 """:py:class:`Pre`: Pre-frame update data"""
                 if not isinstance(self._pre, self.Pre):
-                    self._pre = self.Pre(self._pre)
+                    self._pre = self.Pre(io.BytesIO(self._pre))
                 return self._pre
 
             @property
             def post(self):
                 """:py:class:`Post`: Pre-frame update data"""
                 if not isinstance(self._post, self.Post):
-                    self._post = self.Post(self._post)
+                    self._post = self.Post(io.BytesIO(self._post))
                 return self._post
 
 
@@ -343,28 +378,6 @@ class Frame(Base):
                     self.l_cancel = l_cancel #: :py:class:`LCancel` | None: `added(2.0.0)` L-cancel status, if any
 
 
-    # This class is only used temporarily while parsing frame data.
-    class Event(Base):
-        __slots__ = 'id', 'type', 'data'
-
-        def __init__(self, id, type, data):
-            self.id = id
-            self.type = type
-            self.data = data
-
-
-        class Id(Base):
-            __slots__ = 'frame', 'port', 'is_follower'
-
-            def __init__(self, stream):
-                (self.frame, self.port, self.is_follower) = unpack('iB?', stream)
-
-
-        class Type(Enum):
-            PRE = 'pre'
-            POST = 'post'
-
-
 class Position(Base):
     __slots__ = 'x', 'y'
 
@@ -1,4 +1,5 @@
 from slippi.event import ParseEvent
+from slippi.lazy import LazyFrames
 from slippi.parse import parse
 from slippi.util import *
 
@@ -6,14 +7,25 @@ from slippi.util import *
 class Game(Base):
     """Replay data from a game of Super Smash Brothers Melee."""
 
-    def __init__(self, input):
-        """Parses Slippi replay data from `input` (stream or path)."""
+    def __init__(self, input, columnar = False, lazy = False, cache = None):
+        """Parses Slippi replay data from `input` (stream or path).
+
+        If `columnar` is True, frames are decoded straight into per-port, per-field NumPy arrays (:py:class:`slippi.columnar.Frames`) instead of one object per frame.
+
+        If `lazy` is True, frames are instead a :py:class:`slippi.lazy.LazyFrames` that only builds the frames that are accessed, after a single light scan of the replay. A lazy game parsed from a path keeps the replay memory-mapped, and so a file descriptor open, for as long as its frames exist.
+
+        If a :py:class:`slippi.cache.Cache` is given as `cache`, a previously parsed copy of the replay at path `input` is loaded from it instead of parsing, and newly parsed replays are added to it. Caching requires `columnar`."""
+
+        if columnar and lazy:
+            raise ValueError('frames cannot be both columnar and lazy')
+        if cache is not None and not columnar:
+            raise ValueError('caching requires columnar frames')
 
         self.start = None
         """:py:class:`slippi.event.Start`: Information about the start of the game"""
 
         self.frames = []
-        """list(:py:class:`slippi.event.Frame`): Every frame of the game, indexed by frame number"""
+        """list(:py:class:`slippi.event.Frame`) | :py:class:`slippi.columnar.Frames` | :py:class:`slippi.lazy.LazyFrames`: Every frame of the game, indexed by frame number"""
 
         self.end = None
         """:py:class:`slippi.event.End`: Information about the end of the game"""
@@ -26,13 +38,36 @@ class Game(Base):
 
         handlers = {
             ParseEvent.START: lambda x: setattr(self, 'start', x),
-            ParseEvent.FRAME: lambda x: self.frames.append(x),
             ParseEvent.END: lambda x: setattr(self, 'end', x),
             ParseEvent.METADATA: lambda x: setattr(self, 'metadata', x),
             ParseEvent.METADATA_RAW: lambda x: setattr(self, 'metadata_raw', x)}
 
+        if columnar:
+            handlers[ParseEvent.FRAMES] = lambda x: setattr(self, 'frames', x)
+        elif lazy:
+            handlers[ParseEvent.LAZY_FRAMES] = lambda x: setattr(self, 'frames', x)
+        else:
+            handlers[ParseEvent.FRAME] = lambda x: self.frames.append(x)
+
+        key = cache.key(input) if cache is not None and isinstance(input, str) else None
+        if key and cache.load(key, self):
+            return
+
         parse(input, handlers)
 
+        if key:
+            cache.store(key, self)
+
+    def frame_range(self, start, stop):
+        """Returns the frames numbered from `start` up to (but not including) `stop`. In lazy mode, only those frames are built."""
+
+        if isinstance(self.frames, list):
+            return [f for f in self.frames if start <= f.index < stop]
+        elif isinstance(self.frames, LazyFrames):
+            return self.frames.range(start, stop)
+        else:
+            raise TypeError('frame_range is not supported for columnar frames; select rows using `frames.index` instead')
+
     def _attr_repr(self, attr):
         if attr == 'frames':
             return 'frames=[...](%d)' % len(self.frames)
@@ -0,0 +1,70 @@
+import collections, collections.abc
+
+import numpy as np
+
+from slippi.columnar import frame_events
+from slippi.event import EventType, Frame
+
+
+class LazyFrames(collections.abc.Sequence):
+    """Sequence of :py:class:`slippi.event.Frame` that only builds the frames that are actually accessed.
+
+    Constructed by the parser from a single scan of the replay, which records where each frame's events are. The most recently accessed `cache_size` frames are kept. When parsed from a path, the replay stays memory-mapped, holding an open file descriptor, for as long as these frames exist."""
+
+    def __init__(self, buf, codes, offsets, payload_sizes, cache_size = 256):
+        (frame_codes, frame_offsets, numbers, is_new) = frame_events(np.frombuffer(buf, dtype=np.uint8), codes, offsets)
+
+        self.index = numbers[is_new].astype(np.int32) #: numpy.ndarray(int32): Frame number of each frame
+        self._buf = buf
+        self._payload_sizes = payload_sizes
+        self._is_pre = frame_codes == EventType.FRAME_PRE
+        self._offsets = frame_offsets
+        self._starts = np.append(np.flatnonzero(is_new), len(frame_offsets))
+        self._cache = collections.OrderedDict()
+        self._cache_size = cache_size
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('frame index out of range')
+
+        try:
+            self._cache.move_to_end(i)
+            return self._cache[i]
+        except KeyError:
+            pass
+
+        frame = self._build(i)
+        self._cache[i] = frame
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return frame
+
+    def __getstate__(self):
+        # `buf` may be a view into a memory-mapped replay, which can't be pickled
+        state = self.__dict__.copy()
+        state['_buf'] = bytes(self._buf)
+        state['_cache'] = collections.OrderedDict()
+        return state
+
+    def _build(self, i):
+        frame = Frame(int(self.index[i]))
+        pre_size = self._payload_sizes[EventType.FRAME_PRE]
+        post_size = self._payload_sizes[EventType.FRAME_POST]
+        for j in range(self._starts[i], self._starts[i + 1]):
+            is_pre = self._is_pre[j]
+            frame._add(self._buf, self._offsets[j] + 1, pre_size if is_pre else post_size, is_pre)
+        frame._finalize()
+        return frame
+
+    def range(self, start, stop):
+        """Returns the frames numbered from `start` up to (but not including) `stop`."""
+
+        return [self[i] for i in np.flatnonzero((self.index >= start) & (self.index < stop))]
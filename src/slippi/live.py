@@ -0,0 +1,211 @@
+import io, os, time, ubjson
+
+from slippi.event import CSSCharacter, EventType, ParseEvent, Start, End, Frame
+from slippi.metadata import Metadata
+from slippi.parse import _HEADER, _parse_event_payloads, _scan_events
+from slippi.util import *
+
+
+_METADATA = b'U\x08metadata'
+
+
+class Parser:
+    """Incremental parser for replay data that arrives a chunk at a time, such as a replay that Dolphin is still writing.
+
+    Call :py:meth:`feed` with each new chunk of bytes. Every complete event is parsed and passed to `handlers` (as with :py:func:`slippi.parse.parse`) exactly once; partial events are kept until the rest arrives, and consumed bytes are discarded. Columnar & lazy frames aren't supported.
+
+    A frame is passed to the `ParseEvent.FRAME` handler as soon as post-frame data for every player has arrived, rather than waiting for the next frame to begin. Ice Climbers' frames are the exception, since Nana may or may not have data; those are passed on when the next frame begins."""
+
+    def __init__(self, handlers):
+        self.done = False #: bool: True once the game has ended and its metadata has been parsed
+
+        self._handlers = handlers
+        self._buf = bytearray()
+        self._pos = None
+        self._payload_sizes = None
+        self._expected = None
+        self._frame = None
+        self._ended = False
+
+    def feed(self, data):
+        """Parses as much of the replay as possible, given the next chunk of bytes `data`."""
+
+        self._buf += data
+
+        if self._pos is None:
+            if len(self._buf) < len(_HEADER) + 4:
+                return
+            expect_bytes(_HEADER, io.BytesIO(self._buf[:len(_HEADER)]))
+            self._pos = len(_HEADER) + 4 # raw length is only filled in once the replay is complete
+
+        if self._payload_sizes is None:
+            if len(self._buf) < self._pos + 2 or len(self._buf) < self._pos + 1 + self._buf[self._pos + 1]:
+                return
+            stream = io.BytesIO(self._buf[self._pos:])
+            self._payload_sizes = _parse_event_payloads(stream)
+            self._pos += stream.tell()
+
+        if not self._ended:
+            (codes, offsets, self._pos) = _scan_events(self._buf, self._pos, self._payload_sizes)
+            for (code, offset) in zip(codes, offsets):
+                self._event(code, offset)
+
+        if self._ended and not self.done:
+            self._metadata()
+
+        # Everything before `_pos` has been consumed
+        del self._buf[:self._pos]
+        self._pos = 0
+
+    def _event(self, code, offset):
+        size = self._payload_sizes[code]
+        if code == EventType.FRAME_PRE or code == EventType.FRAME_POST:
+            (index, port, is_follower) = Frame._ID.unpack_from(self._buf, offset + 1)
+            if self._frame and self._frame.index != index:
+                self._emit_frame()
+            if not self._frame:
+                self._frame = Frame(index)
+            self._frame._add(self._buf, offset + 1, size, code == EventType.FRAME_PRE)
+
+            if code == EventType.FRAME_POST and self._expected and self._is_complete():
+                self._emit_frame()
+        elif code == EventType.GAME_START:
+            start = Start._parse(io.BytesIO(self._buf[offset + 1:offset + 1 + size]))
+            if not any(p and p.character is CSSCharacter.ICE_CLIMBERS for p in start.players):
+                self._expected = [i for i in PORTS if start.players[i]]
+            self._handle(ParseEvent.START, start)
+        elif code == EventType.GAME_END:
+            if self._frame:
+                self._emit_frame()
+            self._ended = True
+            self._handle(ParseEvent.END, End._parse(io.BytesIO(self._buf[offset + 1:offset + 1 + size])))
+        else:
+            warn('unknown event code: 0x%02x' % code)
+
+    def _is_complete(self):
+        for i in self._expected:
+            port = self._frame.ports[i]
+            if not port or port.leader._post is None:
+                return False
+        return True
+
+    def _emit_frame(self):
+        self._frame._finalize()
+        self._handle(ParseEvent.FRAME, self._frame)
+        self._frame = None
+
+    def _metadata(self):
+        # Metadata is only written once the game ends, so wait until all of it has arrived
+        stream = io.BytesIO(self._buf[self._pos:])
+        if stream.read(len(_METADATA)) != _METADATA:
+            return
+        try:
+            json = ubjson.load(stream)
+        except ubjson.DecoderException:
+            return
+        if stream.read(1) != b'}':
+            return
+        self._pos += stream.tell()
+
+        self._handle(ParseEvent.METADATA_RAW, json)
+        self._handle(ParseEvent.METADATA, Metadata._parse(json))
+        self.done = True
+
+    def _handle(self, event, obj):
+        handler = self._handlers.get(event)
+        if handler:
+            handler(obj)
+
+
+class Tailer:
+    """Follows a replay file while it is being written, feeding new bytes to a :py:class:`Parser` as they appear."""
+
+    def __init__(self, path, handlers, poll_interval = .001):
+        self.parser = Parser(handlers) #: :py:class:`Parser`: Parser fed by this tailer
+        self.poll_interval = poll_interval #: float: Seconds to wait between checks for new data
+
+        self._path = path
+        self._fd = None
+
+    def poll(self):
+        """Feeds any bytes written since the last poll to the parser. Returns the number of new bytes."""
+
+        if self._fd is None:
+            try:
+                self._fd = os.open(self._path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+            except FileNotFoundError: # not created yet
+                return 0
+
+        total = 0
+        while True:
+            data = os.read(self._fd, 2**16)
+            if not data:
+                return total
+            self.parser.feed(data)
+            total += len(data)
+
+    def run(self, timeout = None):
+        """Polls until the game is over, or until no new data has arrived for `timeout` seconds. Returns True if the game is over."""
+
+        last_data = time.monotonic()
+        try:
+            while not self.parser.done:
+                if self.poll():
+                    last_data = time.monotonic()
+                elif timeout is not None and time.monotonic() - last_data > timeout:
+                    return False
+                else:
+                    time.sleep(self.poll_interval)
+            return True
+        finally:
+            self.close()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def chunks(source):
+    """Splits the replay at path `source` into the pieces Dolphin writes during a game: the header, each frame's events (the first one preceded by the game start), and finally the game end & metadata. Yields each piece as bytes."""
+
+    with open(source, 'rb') as f:
+        buf = f.read()
+
+    raw_start = len(_HEADER) + 4
+    stream = io.BytesIO(buf[raw_start:])
+    payload_sizes = _parse_event_payloads(stream)
+    (codes, offsets, end) = _scan_events(buf, raw_start + stream.tell(), payload_sizes)
+
+    # Dolphin leaves the raw length at zero until the game ends
+    yield _HEADER + b'\0\0\0\0' + buf[raw_start:raw_start + stream.tell()]
+
+    pos = offsets[0] if offsets else end
+    current = None
+    for (code, offset) in zip(codes, offsets):
+        if code == EventType.FRAME_PRE or code == EventType.FRAME_POST:
+            (index, _, _) = Frame._ID.unpack_from(buf, offset + 1)
+            if current is not None and index != current:
+                yield buf[pos:offset]
+                pos = offset
+            current = index
+    yield buf[pos:]
+
+
+def simulate(source, destination, fps = 60):
+    """Writes the replay at path `source` to `destination` the way Dolphin does during a game, one frame at a time at `fps` frames per second. For testing live parsing offline."""
+
+    with open(source, 'rb') as f:
+        f.seek(len(_HEADER))
+        length = f.read(4)
+
+    with open(destination, 'wb') as f:
+        next_frame = time.monotonic()
+        for chunk in chunks(source):
+            f.write(chunk)
+            f.flush()
+            next_frame += 1 / fps
+            time.sleep(max(next_frame - time.monotonic(), 0))
+
+        f.seek(len(_HEADER))
+        f.write(length)
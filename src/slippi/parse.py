@@ -1,10 +1,18 @@
-import io, ubjson
+import io, mmap, ubjson
 
+from slippi.columnar import Frames
 from slippi.event import EventType, ParseEvent, Start, End, Frame
+from slippi.lazy import LazyFrames
 from slippi.metadata import Metadata
 from slippi.util import *
 
 
+# Bump whenever parsed output changes, so that cached replays (see :py:mod:`slippi.cache`) are parsed again.
+PARSER_VERSION = 1
+
+_HEADER = b'{U\x03raw[$U#l'
+
+
 def _parse_event_payloads(stream):
     (code, payload_size) = unpack('BB', stream)
 
@@ -25,94 +33,92 @@ def _parse_event_payloads(stream):
     return payload_sizes
 
 
-def _parse_event(event_stream, payload_sizes):
-    (code,) = unpack('B', event_stream)
-    stream = io.BytesIO(event_stream.read(payload_sizes[code]))
-
-    try: event_type = EventType(code)
-    except ValueError: event_type = None
-
-    if event_type is EventType.GAME_START:
-        event = Start._parse(stream)
-    elif event_type is EventType.FRAME_PRE:
-        event = Frame.Event(Frame.Event.Id(stream),
-                            Frame.Event.Type.PRE,
-                            stream)
-    elif event_type is EventType.FRAME_POST:
-        event = Frame.Event(Frame.Event.Id(stream),
-                            Frame.Event.Type.POST,
-                            stream)
-    elif event_type is EventType.GAME_END:
-        event = End._parse(stream)
-    else:
-        warn('unknown event code: 0x%02x' % code)
-        event = None
+def _scan_events(buf, pos, payload_sizes):
+    """Splits the raw event stream in `buf`, starting at `pos`, into records using the declared payload sizes.
+
+    Returns the command byte & offset of each complete record, and the offset just past the last one. Scanning stops after `GAME_END`."""
 
-    return event
+    codes = []
+    offsets = []
+    end = len(buf)
+    game_end = int(EventType.GAME_END)
+    while pos < end:
+        code = buf[pos]
+        next_pos = pos + payload_sizes[code] + 1
+        if next_pos > end:
+            break
+        codes.append(code)
+        offsets.append(pos)
+        pos = next_pos
+        if code == game_end:
+            break
+    return (codes, offsets, pos)
 
 
-def _parse_events(stream, payload_sizes, handlers):
+def _parse_events(buf, codes, offsets, payload_sizes, handlers):
     current_frame = None
-    done = False
 
-    while not done:
-        event = _parse_event(stream, payload_sizes)
-        if isinstance(event, Start):
-            handler = handlers.get(ParseEvent.START)
-            if handler:
-                handler(event)
-        elif isinstance(event, End):
-            handler = handlers.get(ParseEvent.END)
-            if handler:
-                handler(event)
-            done = True
-        elif isinstance(event, Frame.Event):
-            if current_frame and current_frame.index != event.id.frame:
-                if current_frame.index > event.id.frame:
-                    warn(f'out-of-order-frame: {current_frame.index} -> {event.id.frame}')
+    # Frame objects are only built if someone wants them; columnar & lazy frames are handled in bulk at the end.
+    frame_handler = handlers.get(ParseEvent.FRAME)
+    frames_handler = handlers.get(ParseEvent.FRAMES)
+    lazy_frames_handler = handlers.get(ParseEvent.LAZY_FRAMES)
+
+    frame_pre = int(EventType.FRAME_PRE)
+    frame_post = int(EventType.FRAME_POST)
+    events = zip(codes, offsets)
+    if not frame_handler:
+        events = [(code, offset) for (code, offset) in events if code != frame_pre and code != frame_post]
+
+    for (code, offset) in events:
+        if code == frame_pre or code == frame_post:
+            (index, _, _) = Frame._ID.unpack_from(buf, offset + 1)
+            if current_frame and current_frame.index != index:
+                if current_frame.index > index:
+                    warn(f'out-of-order-frame: {current_frame.index} -> {index}')
 
                 current_frame._finalize()
-                handler = handlers.get(ParseEvent.FRAME)
-                if handler:
-                    handler(current_frame)
+                frame_handler(current_frame)
                 current_frame = None
 
             if not current_frame:
-                current_frame = Frame(event.id.frame)
-
-            port = current_frame.ports[event.id.port]
-            if not port:
-                port = Frame.Port()
-                current_frame.ports[event.id.port] = port
-
-            if event.id.is_follower:
-                if port.follower is None:
-                    port.follower = Frame.Port.Data()
-                data = port.follower
-            else:
-                data = port.leader
-
-            if event.type is Frame.Event.Type.PRE:
-                data._pre = event.data
-            elif event.type is Frame.Event.Type.POST:
-                data._post = event.data
-            else:
-                raise Exception('unknown frame data type: %s' % event.data)
+                current_frame = Frame(index)
+
+            current_frame._add(buf, offset + 1, payload_sizes[code], code == frame_pre)
+        elif code == EventType.GAME_START:
+            handler = handlers.get(ParseEvent.START)
+            if handler:
+                handler(Start._parse(io.BytesIO(buf[offset + 1:offset + 1 + payload_sizes[code]])))
+        elif code == EventType.GAME_END:
+            handler = handlers.get(ParseEvent.END)
+            if handler:
+                handler(End._parse(io.BytesIO(buf[offset + 1:offset + 1 + payload_sizes[code]])))
+        else:
+            warn('unknown event code: 0x%02x' % code)
 
     if current_frame:
         current_frame._finalize()
-        handler = handlers.get(ParseEvent.FRAME)
-        if handler:
-            handler(current_frame)
+        frame_handler(current_frame)
 
+    if frames_handler:
+        frames_handler(Frames._parse(buf, codes, offsets, payload_sizes))
 
-def _parse(stream, handlers):
-    expect_bytes(b'{U\x03raw[$U#l', stream)
-    (length,) = unpack('l', stream) # currently unused
+    if lazy_frames_handler:
+        lazy_frames_handler(LazyFrames(buf, codes, offsets, payload_sizes))
 
-    payload_sizes = _parse_event_payloads(stream)
-    _parse_events(stream, payload_sizes, handlers)
 
+def _parse(buf, handlers):
+    header = io.BytesIO(buf[:len(_HEADER) + 4])
+    expect_bytes(_HEADER, header)
+    (length,) = unpack('l', header)
+    start = header.tell()
+
+    # The whole raw block is split into records in a single pass. Replays that were still being written record a length of zero, in which case the end of the block is found by scanning for `GAME_END`.
+    raw = buf[start:start + length] if length else buf[start:]
+    payload_sizes = _parse_event_payloads(io.BytesIO(raw[:1 + raw[1]]))
+    (codes, offsets, end) = _scan_events(raw, 1 + raw[1], payload_sizes)
+    _parse_events(raw, codes, offsets, payload_sizes, handlers)
+
+    stream = io.BytesIO(buf[start + (length or end):])
     expect_bytes(b'U\x08metadata', stream)
 
     json = ubjson.load(stream)
@@ -131,10 +137,72 @@ def _parse(stream, handlers):
 def parse(input, handlers):
     """Parses Slippi replay data from `input` (stream or path).
 
-    `handlers` should be a dict of :py:class:`slippi.event.ParseEvent` keys to handler functions. Each event will be passed to the corresponding handler as it occurs."""
+    `handlers` should be a dict of :py:class:`slippi.event.ParseEvent` keys to handler functions. Each event will be passed to the corresponding handler as it occurs.
+
+    Frame data is parsed straight out of the replay's bytes, :py:class:`slippi.event.Frame` objects copying only their own payloads and decoding them when a field is first accessed. Paths are memory-mapped rather than read, and the mapping is closed before returning. Lazy frames parse out of the mapping on demand, so each :py:class:`slippi.lazy.LazyFrames` keeps it, and with it an open file descriptor, until the frames are garbage collected."""
+
+    if not isinstance(input, str):
+        _parse(memoryview(input.read()), handlers)
+    else:
+        with open(input, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if ParseEvent.LAZY_FRAMES in handlers:
+            _parse(memoryview(buf), handlers)
+            return
+        try:
+            _parse(memoryview(buf), handlers)
+        finally:
+            try:
+                buf.close()
+            except BufferError: # a handler kept a view into the map, which is then released once that is collected
+                pass
+
+
+def _peek_header(stream):
+    expect_bytes(_HEADER, stream)
+    (length,) = unpack('l', stream)
+    raw_start = stream.tell()
+    payload_sizes = _parse_event_payloads(stream)
+    return (length, raw_start, payload_sizes)
+
+
+def _peek_start(stream):
+    (_, _, payload_sizes) = _peek_header(stream)
+    (code,) = unpack('B', stream)
+    if code != EventType.GAME_START:
+        raise Exception('expected game start, but got: 0x%02x' % code)
+    return Start._parse(io.BytesIO(stream.read(payload_sizes[code])))
+
+
+def _peek_metadata(stream):
+    (length, raw_start, payload_sizes) = _peek_header(stream)
+    if length:
+        stream.seek(raw_start + length)
+    else:
+        # Replays that were still being written don't record the raw block's length, so it has to be scanned
+        buf = stream.read()
+        (_, _, end) = _scan_events(buf, 0, payload_sizes)
+        stream = io.BytesIO(buf[end:])
+
+    expect_bytes(b'U\x08metadata', stream)
+    return Metadata._parse(ubjson.load(stream))
+
+
+def peek_start(input):
+    """Parses only the :py:class:`slippi.event.Start` event of the replay `input` (seekable stream or path), without reading any frames."""
+
+    if isinstance(input, str):
+        with open(input, 'rb') as f:
+            return _peek_start(f)
+    else:
+        return _peek_start(input)
+
+
+def peek_metadata(input):
+    """Parses only the :py:class:`slippi.metadata.Metadata` of the replay `input` (seekable stream or path), seeking straight past the frame data."""
 
     if isinstance(input, str):
         with open(input, 'rb') as f:
-            _parse(f, handlers)
+            return _peek_metadata(f)
     else:
-        _parse(input, handlers)
+        return _peek_metadata(input)
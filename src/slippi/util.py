@@ -1,4 +1,4 @@
-import enum, re, struct, sys, termcolor, warnings
+import enum, functools, re, struct, sys, termcolor, warnings
 
 
 PORTS = range(4)
@@ -39,16 +39,20 @@ def try_enum(enum, val):
         return val
 
 
+@functools.lru_cache(maxsize=None)
+def _struct(fmt):
+    return struct.Struct('>' + fmt)
+
+
 def unpack(fmt, stream):
-    fmt = '>' + fmt
-    size = struct.calcsize(fmt)
+    s = _struct(fmt)
     if not isinstance(stream, bytes):
-        bytes_obj = stream.read(size)
+        bytes_obj = stream.read(s.size)
     else:
-        bytes_obj = stream[:size]
+        bytes_obj = stream[:s.size]
     if not bytes_obj:
         raise EofException()
-    return struct.unpack(fmt, bytes_obj)
+    return s.unpack(bytes_obj)
 
 
 def expect_bytes(expected_bytes, stream):